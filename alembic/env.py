@@ -5,22 +5,13 @@ from sqlalchemy import pool
 
 from alembic import context
 
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from src.settings import get_settings
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
-POSTGRES_USER = os.environ.get("POSTGRES_USER")
-POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASSWORD")
-POSTGRES_DB = os.environ.get("POSTGRES_DB")
-POSTGRES_PORT = os.environ.get("POSTGRES_PORT")
-POSTGRES_SERVER = os.environ.get("POSTGRES_SERVER")
-URL_DATABASE = f"postgresql://{POSTGRES_USER}:" f"{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
-config.set_main_option("sqlalchemy.url", URL_DATABASE)
+config.set_main_option("sqlalchemy.url", get_settings().database_url())
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -0,0 +1,25 @@
+"""User project keyset index
+
+Revision ID: 4f2b7c1d9e3a
+Revises: 89d15ddcaa3b
+Create Date: 2026-10-17 09:12:44.118204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "4f2b7c1d9e3a"
+down_revision: Union[str, None] = "89d15ddcaa3b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("idx_user_project_user_id_project_id", "user_project", ["user_id", "project_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_user_project_user_id_project_id", table_name="user_project")
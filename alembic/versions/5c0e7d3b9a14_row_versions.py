@@ -0,0 +1,26 @@
+"""Project row versions
+
+Revision ID: 5c0e7d3b9a14
+Revises: d41a9c7e2f08
+Create Date: 2026-10-17 16:20:51.774092
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "5c0e7d3b9a14"
+down_revision: Union[str, None] = "d41a9c7e2f08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("projects", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    op.drop_column("projects", "version")
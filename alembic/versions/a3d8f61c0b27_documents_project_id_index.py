@@ -0,0 +1,25 @@
+"""Documents project_id index
+
+Revision ID: a3d8f61c0b27
+Revises: 5c0e7d3b9a14
+Create Date: 2026-10-17 20:15:37.902114
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "a3d8f61c0b27"
+down_revision: Union[str, None] = "5c0e7d3b9a14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_documents_project_id", "documents", ["project_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_project_id", table_name="documents")
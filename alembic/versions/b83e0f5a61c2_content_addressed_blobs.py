@@ -0,0 +1,35 @@
+"""Content addressed blobs
+
+Revision ID: b83e0f5a61c2
+Revises: 4f2b7c1d9e3a
+Create Date: 2026-10-17 13:41:07.502931
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "b83e0f5a61c2"
+down_revision: Union[str, None] = "4f2b7c1d9e3a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "blobs",
+        sa.Column("digest", sa.String(64), primary_key=True),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column("documents", sa.Column("blob_digest", sa.String(64), sa.ForeignKey("blobs.digest"), nullable=True))
+    op.create_index("ix_documents_blob_digest", "documents", ["blob_digest"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_blob_digest", table_name="documents")
+    op.drop_column("documents", "blob_digest")
+    op.drop_table("blobs")
@@ -0,0 +1,286 @@
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+from sqlalchemy import Engine, create_engine, event, insert
+
+import src.database
+from src.auth import create_access_token
+from src.database import Database
+from src.main import app
+from src.models import Base, Projects, UserProject, Users
+from src.passwords import hash_password
+from src.settings import get_settings
+
+BENCH_PASSWORD = "benchmark-password"
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+
+@dataclass
+class BenchUser:
+    id: uuid.UUID
+    email: str
+    token: str
+
+
+@dataclass
+class Dataset:
+    users: list[BenchUser]
+    projects: list[list[uuid.UUID]]
+    invitees: list[str]
+    disposable_projects: list[uuid.UUID]
+
+
+type Scenario = Callable[[httpx.AsyncClient, Dataset, int], Awaitable[httpx.Response]]
+
+
+def create_sqlite_engine(path: Path) -> Engine:
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+
+    @event.listens_for(engine, "connect")
+    def enable_wal(dbapi_connection: Any, connection_record: Any) -> None:
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+        dbapi_connection.execute("PRAGMA synchronous=NORMAL")
+
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def seed(engine: Engine, users: int, projects_per_user: int, requests: int) -> Dataset:
+    hashed_password = hash_password(BENCH_PASSWORD)
+    expire = get_settings().access_token_expire
+    user_rows = [
+        {"id": uuid.uuid4(), "name": f"user{i}", "email": f"user{i}@bench.local", "hashed_password": hashed_password}
+        for i in range(users)
+    ]
+    invitee_rows = [
+        {"id": uuid.uuid4(), "name": f"invitee{i}", "email": f"invitee{i}@bench.local", "hashed_password": "-"}
+        for i in range(requests)
+    ]
+    projects = [[uuid.uuid4() for _ in range(projects_per_user)] for _ in range(users)]
+    disposable_projects = [uuid.uuid4() for _ in range(requests)]
+    owners = [(project_id, user_rows[i]["id"]) for i, owned in enumerate(projects) for project_id in owned]
+    owners += [(project_id, user_rows[i % users]["id"]) for i, project_id in enumerate(disposable_projects)]
+    with engine.begin() as connection:
+        connection.execute(insert(Users), user_rows + invitee_rows)
+        connection.execute(
+            insert(Projects),
+            [
+                {"id": project_id, "name": f"project {project_id}", "description": "benchmark"}
+                for project_id, _ in owners
+            ],
+        )
+        connection.execute(
+            insert(UserProject),
+            [{"project_id": project_id, "user_id": user_id, "is_admin": True} for project_id, user_id in owners],
+        )
+    return Dataset(
+        users=[
+            BenchUser(row["id"], row["email"], create_access_token(row["name"], row["id"], expire)) for row in user_rows
+        ],
+        projects=projects,
+        invitees=[row["email"] for row in invitee_rows],
+        disposable_projects=disposable_projects,
+    )
+
+
+def _auth(user: BenchUser) -> dict[str, str]:
+    return {"Authorization": f"Bearer {user.token}"}
+
+
+def _owned_project(dataset: Dataset, i: int) -> tuple[BenchUser, uuid.UUID]:
+    user_index = i % len(dataset.users)
+    owned = dataset.projects[user_index]
+    return dataset.users[user_index], owned[(i // len(dataset.users)) % len(owned)]
+
+
+async def login(client: httpx.AsyncClient, dataset: Dataset, i: int) -> httpx.Response:
+    user = dataset.users[i % len(dataset.users)]
+    return await client.post("/token", data={"username": user.email, "password": BENCH_PASSWORD})
+
+
+async def list_projects(client: httpx.AsyncClient, dataset: Dataset, i: int) -> httpx.Response:
+    return await client.get("/projects", headers=_auth(dataset.users[i % len(dataset.users)]))
+
+
+async def project_info(client: httpx.AsyncClient, dataset: Dataset, i: int) -> httpx.Response:
+    user, project_id = _owned_project(dataset, i)
+    return await client.get(f"/project/{project_id}/info", headers=_auth(user))
+
+
+async def update_project(client: httpx.AsyncClient, dataset: Dataset, i: int) -> httpx.Response:
+    user, project_id = _owned_project(dataset, i)
+    body = {"name": f"project {project_id}", "description": f"update {i}"}
+    return await client.put(f"/project/{project_id}/info", json=body, headers=_auth(user))
+
+
+async def invite(client: httpx.AsyncClient, dataset: Dataset, i: int) -> httpx.Response:
+    user, project_id = _owned_project(dataset, i)
+    params = {"user_email": dataset.invitees[i]}
+    return await client.post(f"/project/{project_id}/invite", params=params, headers=_auth(user))
+
+
+async def delete_project(client: httpx.AsyncClient, dataset: Dataset, i: int) -> httpx.Response:
+    user = dataset.users[i % len(dataset.users)]
+    return await client.delete(f"/project/{dataset.disposable_projects[i]}", headers=_auth(user))
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "token": login,
+    "list_projects": list_projects,
+    "project_info": project_info,
+    "update_project": update_project,
+    "invite": invite,
+    "delete_project": delete_project,
+}
+
+
+async def measure(
+    client: httpx.AsyncClient, dataset: Dataset, scenario: Scenario, requests: int, concurrency: int
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    errors = 0
+    indexes = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in indexes:
+            start = time.perf_counter()
+            response = await scenario(client, dataset, i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentiles[49] * 1000, 3),
+        "p95_ms": round(percentiles[94] * 1000, 3),
+        "p99_ms": round(percentiles[98] * 1000, 3),
+    }
+
+
+def measure_import_time(runs: int) -> dict[str, Any]:
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import time; s = time.perf_counter(); import src.main; print(time.perf_counter() - s)",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        timings.append(float(output))
+    return {"errors": 0, "import_ms": round(min(timings) * 1000, 3)}
+
+
+async def run(dataset: Dataset, scenarios: list[str], requests: int, concurrency: int) -> dict[str, Any]:
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with (
+        app.router.lifespan_context(app),
+        httpx.AsyncClient(transport=transport, base_url="http://bench") as client,
+    ):
+        for name in scenarios:
+            results[name] = await measure(client, dataset, SCENARIOS[name], requests, concurrency)
+    return results
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        if result["errors"]:
+            regressions.append(f"{name}: {result['errors']} failed requests")
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if "import_ms" in result:
+            if result["import_ms"] > expected["import_ms"] * (1 + tolerance):
+                regressions.append(f"{name}: import {result['import_ms']}ms > baseline {expected['import_ms']}ms")
+            continue
+        if result["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms > baseline {expected['p95_ms']}ms")
+        if result["throughput_rps"] < expected["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['throughput_rps']} req/s < baseline {expected['throughput_rps']} req/s"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the API in-process against a seeded SQLite database. "
+        "Run from the repository root with: python -m benchmarks.bench_http"
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--projects-per-user", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, dest="scenarios")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--import-runs", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_sqlite_engine(Path(directory) / "bench.db")
+        src.database._database = Database.from_engine(engine)
+        dataset = seed(engine, args.users, args.projects_per_user, args.requests)
+        results = asyncio.run(run(dataset, args.scenarios or list(SCENARIOS), args.requests, args.concurrency))
+        engine.dispose()
+    results["startup"] = measure_import_time(args.import_runs)
+
+    report = {
+        "config": {
+            "users": args.users,
+            "projects_per_user": args.projects_per_user,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        return
+    if not args.baseline.exists():
+        baseline = {"config": report["config"], "results": {}}
+    else:
+        baseline = json.loads(args.baseline.read_text())
+    if baseline["config"] != report["config"]:
+        sys.exit(
+            f"Not comparing against {args.baseline}: it was recorded with {baseline['config']}, "
+            f"this run used {report['config']}. Rerun at the baseline scale or pass a matching --baseline."
+        )
+    regressions = compare(results, baseline["results"], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+import asyncio
+import os
+import time
+
+from src.passwords import hash_password, verify_password_async
+from src.settings import get_settings
+
+
+async def run(logins: int, concurrency: int, hashed_password: str) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login() -> None:
+        async with semaphore:
+            is_valid, _ = await verify_password_async("benchmark-password", hashed_password)
+            assert is_valid
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Measure password verification throughput.")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=settings.password_hash_workers)
+    parser.add_argument("--cost", type=int, default=settings.password_hash_cost)
+    args = parser.parse_args()
+
+    hashed_password = hash_password("benchmark-password", cost=args.cost)
+    elapsed = asyncio.run(run(args.logins, args.concurrency, hashed_password))
+    cores = min(settings.password_hash_workers, os.cpu_count() or 1)
+    logins_per_second = args.logins / elapsed
+    print(f"cost=2^{args.cost} workers={settings.password_hash_workers} logins={args.logins} elapsed={elapsed:.2f}s")
+    print(f"logins/s={logins_per_second:.1f} logins/s/core={logins_per_second / cores:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import json
+import timeit
+import uuid
+from collections.abc import Callable
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from src.models import Base, Projects
+from src.responses import project_payload
+from src.schemas import ProjectDetails
+
+project_list = TypeAdapter(list[ProjectDetails])
+
+
+def orm_rows_via_pydantic(session: Session) -> bytes:
+    projects = session.execute(select(Projects)).scalars().all()
+    models = [ProjectDetails(**project.__dict__, project_id=project.id) for project in projects]
+    content = project_list.dump_python(project_list.validate_python(models), mode="json")
+    session.expunge_all()
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def column_rows_via_orjson(session: Session) -> bytes:
+    rows = session.execute(select(Projects.id, Projects.name, Projects.description)).all()
+    return orjson.dumps([project_payload(*row) for row in rows])
+
+
+def best_ms(fn: Callable[[], object], repeat: int) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare project list serialization paths.")
+    parser.add_argument("--projects", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Projects),
+            [
+                {"id": uuid.uuid4(), "name": f"Project {i}", "description": f"Description of project {i}"}
+                for i in range(args.projects)
+            ],
+        )
+
+    with Session(engine) as session:
+        assert json.loads(orm_rows_via_pydantic(session)) == json.loads(column_rows_via_orjson(session))
+        before = best_ms(lambda: orm_rows_via_pydantic(session), args.repeat)
+        after = best_ms(lambda: column_rows_via_orjson(session), args.repeat)
+        models = [ProjectDetails(project_id=uuid.uuid4(), name="name", description="description")] * args.projects
+        payloads = [project_payload(uuid.uuid4(), "name", "description")] * args.projects
+        encode_before = best_ms(
+            lambda: json.dumps(project_list.dump_python(project_list.validate_python(models), mode="json")),
+            args.repeat,
+        )
+        encode_after = best_ms(lambda: orjson.dumps(payloads), args.repeat)
+
+    print(f"projects={args.projects}")
+    print(
+        f"load+serialize  ORM+pydantic+json: {before:8.2f} ms   columns+orjson: {after:8.2f} ms   x{before / after:.1f}"
+    )
+    print(
+        f"serialize only  pydantic+json:     {encode_before:8.2f} ms   orjson:         {encode_after:8.2f} ms"
+        f"   x{encode_before / encode_after:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
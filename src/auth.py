@@ -1,36 +1,52 @@
-import os
+import hashlib
+import secrets
+import time
 import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
 import jwt
-from dotenv import load_dotenv
-from fastapi import Depends, HTTPException, Request
+from fastapi import Depends, Header, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
 from starlette import status
-from starlette.responses import Response, JSONResponse
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+from src.cache import LRUCache
 from src.schemas import CurrentUser
+from src.settings import get_settings
 
-load_dotenv()
-
-OAUTH_SECRET_KEY = os.environ.get("OAUTH_SECRET_KEY", "")
+settings = get_settings()
 _OAUTH_ALGORITHM = "HS256"
 
 
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="/token")
+verified_tokens: LRUCache[bytes, CurrentUser] = LRUCache(settings.token_cache_size, timer=time.time)
 
 
 def create_access_token(name: str, user_id: uuid.UUID, expires_delta: timedelta) -> str:
     payload = {"sub": name, "id": str(user_id), "exp": datetime.now(timezone.utc) + expires_delta}
-    return jwt.encode(payload, OAUTH_SECRET_KEY, algorithm=_OAUTH_ALGORITHM)
+    return jwt.encode(payload, settings.oauth_secret_key, algorithm=_OAUTH_ALGORITHM)
+
+
+def new_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def refresh_token_digest(refresh_token: str) -> bytes:
+    return hashlib.sha256(refresh_token.encode()).digest()
 
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]) -> CurrentUser:
+    digest = hashlib.sha256(token.encode()).digest()
+    cached_user = verified_tokens.get(digest)
+    if cached_user is not None:
+        return cached_user
     try:
-        payload = jwt.decode(token, OAUTH_SECRET_KEY, algorithms=_OAUTH_ALGORITHM)
+        payload = jwt.decode(token, settings.oauth_secret_key, algorithms=_OAUTH_ALGORITHM)
         email = payload["sub"]
         user_id = payload["id"]
+        expires_at = payload.get("exp")
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
     except jwt.InvalidTokenError:
@@ -39,19 +55,58 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]) -> Cur
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid token payload: {e.args[0]} missing"
         )
-    return CurrentUser(id=user_id, email=email)
+    user = CurrentUser(id=user_id, email=email)
+    if expires_at is not None:
+        verified_tokens.set(digest, user, ttl=expires_at - time.time())
+    return user
+
+
+async def get_request_user(request: Request, token: Annotated[str, Depends(oauth2_bearer)]) -> CurrentUser:
+    user = getattr(request.state, "user", None)
+    if user is None:
+        return await get_current_user(token)
+    return user
+
+
+async def require_internal_access(x_internal_key: Annotated[str | None, Header()] = None) -> None:
+    if not settings.internal_api_key:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_internal_key is None or not secrets.compare_digest(x_internal_key, settings.internal_api_key):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid internal API key")
+
+
+PUBLIC_ROUTES = {
+    "/",
+    "/token",
+    "/token/refresh",
+    "/token/revoke",
+    "/auth",
+    "/docs",
+    "/openapi.json",
+    "/metrics",
+}
 
 
-async def auth_middleware(request: Request, call_next) -> Response:
-    public_routes = {"/", "/token", "/auth", "/docs", "/openapi.json"}
+class AuthMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-    if request.url.path in public_routes:
-        return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in PUBLIC_ROUTES:
+            await self.app(scope, receive, send)
+            return
 
-    authorization = request.headers.get("Authorization")
-    if not authorization:
-        return JSONResponse(status_code=401, content={"detail": "Invalid or missing authorization token"})
-    token = authorization.split(" ")[-1]
-    user = await get_current_user(token)
-    request.state.user = user
-    return await call_next(request)
+        request = Request(scope)
+        authorization = request.headers.get("Authorization")
+        if not authorization:
+            response = JSONResponse(status_code=401, content={"detail": "Invalid or missing authorization token"})
+            await response(scope, receive, send)
+            return
+        token = authorization.split(" ")[-1]
+        try:
+            user = await get_current_user(token)
+        except HTTPException as e:
+            await JSONResponse(status_code=e.status_code, content={"detail": e.detail})(scope, receive, send)
+            return
+        request.state.user = user
+        await self.app(scope, receive, send)
@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Any, Awaitable, Callable, Protocol
+
+
+class LRUCache[K, V]:
+    def __init__(self, maxsize: int, ttl: float | None = None, timer: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: OrderedDict[K, tuple[V, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._timer():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self._timer() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class MembershipRole(StrEnum):
+    NONE = "none"
+    MEMBER = "member"
+    ADMIN = "admin"
+
+
+class MembershipCache(Protocol):
+    generation: int
+
+    def get(self, user_id: uuid.UUID, project_id: uuid.UUID) -> MembershipRole | None: ...
+
+    def set(self, user_id: uuid.UUID, project_id: uuid.UUID, role: MembershipRole, generation: int) -> None: ...
+
+    def invalidate(self, user_id: uuid.UUID, project_id: uuid.UUID) -> None: ...
+
+    def stats(self) -> dict[str, Any]: ...
+
+
+class InProcessMembershipCache:
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._entries: LRUCache[tuple[uuid.UUID, uuid.UUID], MembershipRole] = LRUCache(maxsize, ttl)
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def get(self, user_id: uuid.UUID, project_id: uuid.UUID) -> MembershipRole | None:
+        return self._entries.get((user_id, project_id))
+
+    def set(self, user_id: uuid.UUID, project_id: uuid.UUID, role: MembershipRole, generation: int) -> None:
+        with self._lock:
+            if generation == self.generation:
+                self._entries.set((user_id, project_id), role)
+
+    def invalidate(self, user_id: uuid.UUID, project_id: uuid.UUID) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.pop((user_id, project_id))
+
+    def stats(self) -> dict[str, Any]:
+        return self._entries.stats()
+
+
+@dataclass(frozen=True)
+class CachedProject:
+    project_id: uuid.UUID
+    name: str
+    description: str | None
+    version: int
+
+
+class ProjectDetailsCache(Protocol):
+    generation: int
+
+    def get(self, project_id: uuid.UUID) -> CachedProject | None: ...
+
+    def set(self, project: CachedProject, generation: int) -> None: ...
+
+    def invalidate(self, project_id: uuid.UUID) -> None: ...
+
+    def stats(self) -> dict[str, Any]: ...
+
+
+class InProcessProjectDetailsCache:
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._entries: LRUCache[uuid.UUID, CachedProject] = LRUCache(maxsize, ttl)
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def get(self, project_id: uuid.UUID) -> CachedProject | None:
+        return self._entries.get(project_id)
+
+    def set(self, project: CachedProject, generation: int) -> None:
+        with self._lock:
+            if generation == self.generation:
+                self._entries.set(project.project_id, project)
+
+    def invalidate(self, project_id: uuid.UUID) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(project_id)
+
+    def stats(self) -> dict[str, Any]:
+        return self._entries.stats()
+
+
+class SingleFlight[K, V]:
+    def __init__(self) -> None:
+        self._calls: dict[K, asyncio.Future[V]] = {}
+        self.shared = 0
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        while (call := self._calls.get(key)) is not None:
+            self.shared += 1
+            try:
+                return await asyncio.shield(call)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not call.cancelled() or (task is not None and task.cancelling()):
+                    raise
+        call = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except Exception as e:
+            call.set_exception(e)
+            call.exception()
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
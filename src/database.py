@@ -0,0 +1,204 @@
+import dataclasses
+import hashlib
+import hmac
+import math
+import time
+import uuid
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Callable
+
+from sqlalchemy import Connection, Engine, create_engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.cache import LRUCache
+from src.deadlines import apply_statement_timeout, interrupt_at_deadline
+from src.metrics import request_metrics, track_db_time
+from src.pool_stats import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, PoolStats, instrument_engine
+from src.settings import Settings, get_settings
+
+
+class RequestSession(Session):
+    pass
+
+
+event.listen(RequestSession, "after_begin", apply_statement_timeout)
+
+
+@dataclass
+class Database:
+    engine: Engine
+    session_factory: sessionmaker[Session]
+    pool_stats: PoolStats
+    async_engine: AsyncEngine | None = None
+    async_session_factory: async_sessionmaker[AsyncSession] | None = None
+    async_pool_stats: PoolStats | None = None
+    replica: "Database | None" = None
+
+    @classmethod
+    def from_engine(cls, engine: Engine, async_engine: AsyncEngine | None = None) -> "Database":
+        interrupt_at_deadline(engine)
+        track_db_time(engine)
+        database = cls(
+            engine,
+            sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RequestSession),
+            instrument_engine(engine),
+        )
+        if async_engine is not None:
+            track_db_time(async_engine.sync_engine)
+            database.async_engine = async_engine
+            database.async_session_factory = async_sessionmaker(
+                async_engine, autoflush=False, expire_on_commit=False, sync_session_class=RequestSession
+            )
+            database.async_pool_stats = instrument_engine(async_engine.sync_engine)
+        return database
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "Database":
+        pool_options = {
+            "pool_size": settings.postgres_pool_size,
+            "max_overflow": settings.postgres_max_overflow,
+            "pool_timeout": settings.postgres_pool_timeout,
+            "pool_recycle": settings.postgres_pool_recycle,
+            "pool_pre_ping": settings.postgres_pool_pre_ping,
+        }
+        engine = create_engine(settings.database_url(), poolclass=InstrumentedQueuePool, **pool_options)
+        async_engine = (
+            create_async_engine(
+                settings.database_url("postgresql+asyncpg"),
+                poolclass=InstrumentedAsyncAdaptedQueuePool,
+                **pool_options,
+            )
+            if settings.database_async
+            else None
+        )
+        database = cls.from_engine(engine, async_engine)
+        if settings.postgres_replica_server:
+            replica_settings = dataclasses.replace(
+                settings, postgres_server=settings.postgres_replica_server, postgres_replica_server=""
+            )
+            database.replica = cls.from_settings(replica_settings)
+        return database
+
+    async def open_connections(self, count: int) -> None:
+        if self.async_engine is not None:
+            async_connections = [await self.async_engine.connect() for _ in range(count)]
+            for async_connection in async_connections:
+                await async_connection.close()
+            return
+
+        def connect() -> None:
+            connections: list[Connection] = [self.engine.connect() for _ in range(count)]
+            for connection in connections:
+                connection.close()
+
+        await run_in_threadpool(connect)
+
+    async def dispose(self) -> None:
+        if self.replica is not None:
+            await self.replica.dispose()
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
+        await run_in_threadpool(self.engine.dispose)
+
+
+class ReadTarget(StrEnum):
+    PRIMARY = "primary"
+    STICKY_PRIMARY = "sticky_primary"
+    REPLICA = "replica"
+
+
+READ_YOUR_WRITES_COOKIE = "last_write"
+
+
+def _sign_write(user_id: uuid.UUID, until: str) -> str:
+    key = get_settings().oauth_secret_key.encode()
+    return hmac.new(key, f"{user_id.hex}.{until}".encode(), hashlib.sha256).hexdigest()
+
+
+class ReadRouter:
+    def __init__(self, maxsize: int, window: float, timer: Callable[[], float] = time.time) -> None:
+        self.window = window
+        self._timer = timer
+        self._recent_writers: LRUCache[uuid.UUID, bool] = LRUCache(maxsize, window)
+
+    def record_write(self, user_id: uuid.UUID) -> str | None:
+        if self.window <= 0:
+            return None
+        self._recent_writers.set(user_id, True)
+        until = str(math.ceil(self._timer() + self.window))
+        return f"{user_id.hex}.{until}.{_sign_write(user_id, until)}"
+
+    def wrote_recently(self, user_id: uuid.UUID, cookie: str | None = None) -> bool:
+        if self._recent_writers.get(user_id):
+            return True
+        if not cookie or self.window <= 0:
+            return False
+        owner, _, rest = cookie.partition(".")
+        until, _, signature = rest.partition(".")
+        if owner != user_id.hex or not hmac.compare_digest(signature, _sign_write(user_id, until)):
+            return False
+        try:
+            return self._timer() < float(until)
+        except ValueError:
+            return False
+
+    def route(self, database: Database, user_id: uuid.UUID, cookie: str | None = None) -> ReadTarget:
+        if database.replica is None:
+            target = ReadTarget.PRIMARY
+        elif self.wrote_recently(user_id, cookie):
+            target = ReadTarget.STICKY_PRIMARY
+        else:
+            target = ReadTarget.REPLICA
+        request_metrics.db_reads[target] += 1
+        return target
+
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+read_router = ReadRouter(get_settings().read_your_writes_cache_size, get_settings().read_your_writes_seconds)
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_recording_writes(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                user = scope.get("state", {}).get("user")
+                cookie = read_router.record_write(user.id) if user is not None else None
+                if cookie is not None:
+                    max_age = math.ceil(read_router.window)
+                    MutableHeaders(scope=message).append(
+                        "set-cookie",
+                        f"{READ_YOUR_WRITES_COOKIE}={cookie}; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax",
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_recording_writes)
+
+
+_database: Database | None = None
+
+
+def get_database() -> Database:
+    global _database
+    if _database is None:
+        _database = Database.from_settings(get_settings())
+    return _database
+
+
+async def close_database() -> None:
+    global _database
+    if _database is not None:
+        await _database.dispose()
+        _database = None
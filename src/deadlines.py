@@ -0,0 +1,179 @@
+import asyncio
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable
+
+import anyio
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Connection, Engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, SessionTransaction
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.metrics import request_metrics, route_template
+from src.settings import get_settings
+
+TIMEOUT_HEADER = "X-Request-Timeout"
+QUERY_CANCELED = "57014"
+ROUTE_TIMEOUTS: dict[tuple[str, str], float] = {
+    ("POST", "/projects/batch"): 120,
+    ("POST", "/project/{project_id}/invite/batch"): 120,
+    ("POST", "/project/{project_id}/documents"): 600,
+}
+
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class _StatementGuard:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._dbapi_connection: Any = None
+        self.expired = False
+
+    def begin(self, dbapi_connection: Any) -> None:
+        with self._lock:
+            if self.expired:
+                raise DeadlineExceeded()
+            self._dbapi_connection = dbapi_connection
+
+    def end(self) -> None:
+        with self._lock:
+            self._dbapi_connection = None
+
+    def expire(self) -> None:
+        with self._lock:
+            self.expired = True
+            if self._dbapi_connection is None:
+                return
+            interrupt = getattr(self._dbapi_connection, "cancel", None) or getattr(
+                self._dbapi_connection, "interrupt", None
+            )
+            if interrupt is not None:
+                interrupt()
+
+
+_statement_guard: ContextVar[_StatementGuard | None] = ContextVar("statement_guard", default=None)
+
+
+def remaining_time() -> float | None:
+    deadline = _deadline.get()
+    return deadline - time.monotonic() if deadline is not None else None
+
+
+def is_statement_timeout(exc: BaseException) -> bool:
+    if not isinstance(exc, OperationalError):
+        return False
+    orig: Any = exc.orig
+    return QUERY_CANCELED in (getattr(orig, "pgcode", None), getattr(orig, "sqlstate", None))
+
+
+def apply_statement_timeout(session: Session, transaction: SessionTransaction, connection: Connection) -> None:
+    remaining = remaining_time()
+    if remaining is None:
+        return
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}")
+
+
+def interrupt_at_deadline(engine: Engine) -> None:
+    def before_cursor_execute(conn: Connection, *_: Any) -> None:
+        guard = _statement_guard.get()
+        if guard is not None:
+            guard.begin(conn.connection.dbapi_connection)
+
+    def end_statement(*_: Any) -> None:
+        guard = _statement_guard.get()
+        if guard is not None:
+            guard.end()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", end_statement)
+    event.listen(engine, "handle_error", end_statement)
+
+
+async def run_interruptible[T](fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    remaining = remaining_time()
+    if remaining is None:
+        return await run_in_threadpool(fn, *args, **kwargs)
+    guard = _StatementGuard()
+    token = _statement_guard.set(guard)
+    timer = asyncio.get_running_loop().call_later(max(0, remaining), guard.expire)
+    try:
+        return await run_in_threadpool(fn, *args, **kwargs)
+    except OperationalError as e:
+        if guard.expired:
+            raise DeadlineExceeded() from e
+        raise
+    finally:
+        timer.cancel()
+        _statement_guard.reset(token)
+
+
+def request_timeout(request: Request, route: str) -> float | None:
+    settings = get_settings()
+    timeout = ROUTE_TIMEOUTS.get((request.method, route), settings.request_timeout)
+    requested = request.headers.get(TIMEOUT_HEADER)
+    if requested is not None:
+        try:
+            timeout = float(requested)
+        except ValueError:
+            timeout = math.nan
+        if not 0 < timeout < math.inf:
+            raise ValueError(f"Invalid {TIMEOUT_HEADER} header: {requested}")
+        timeout = min(timeout, settings.max_request_timeout)
+    return timeout or None
+
+
+class DeadlineMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        route = route_template(request)
+        try:
+            timeout = request_timeout(request, route)
+        except ValueError as e:
+            await ORJSONResponse({"detail": str(e)}, status_code=400)(scope, receive, send)
+            return
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+
+        response_started = timed_out = False
+        with anyio.CancelScope(deadline=anyio.current_time() + timeout) as cancel_scope:
+
+            async def send_until_deadline(message: Message) -> None:
+                nonlocal response_started
+                if message["type"] == "http.response.start":
+                    cancel_scope.deadline = math.inf
+                    await send(message)
+                    response_started = True
+                    return
+                await send(message)
+
+            token = _deadline.set(time.monotonic() + timeout)
+            try:
+                await self.app(scope, receive, send_until_deadline)
+            except Exception as e:
+                if response_started or not (isinstance(e, DeadlineExceeded) or is_statement_timeout(e)):
+                    raise
+                timed_out = True
+            finally:
+                _deadline.reset(token)
+        if (timed_out or cancel_scope.cancelled_caught) and not response_started:
+            request_metrics.timeouts[(request.method, route)] += 1
+            await ORJSONResponse({"detail": "Request deadline exceeded"}, status_code=504)(scope, receive, send)
@@ -1,124 +1,438 @@
 import uuid
-from datetime import timedelta
-from typing import Annotated
+import zlib
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, AsyncIterator
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+import orjson
+from fastapi import Body, Depends, FastAPI, Form, Header, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from pydantic import AnyUrl, ValidationError
 from sqlalchemy.orm import Session
 from starlette import status
 
-from src.auth import get_current_user, auth_middleware, create_access_token
-from src.schemas import Project, ProjectDetails, CurrentUser, User, OAuth2TokenResponse
+from src.cache import CachedProject
+from src.deadlines import DeadlineMiddleware
+from src.database import ReadYourWritesMiddleware, close_database, get_database
+from src.auth import AuthMiddleware, get_request_user, create_access_token, require_internal_access, verified_tokens
+from src.metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, request_metrics
+from src.passwords import hash_password_async
+from src.ratelimit import AdmissionMiddleware
+from src.responses import (
+    StorageFileResponse,
+    collection_etag,
+    etag_matches,
+    project_etag,
+    project_payload,
+    project_versions,
+)
+from src.schemas import (
+    BatchProjectResult,
+    BlobCheckResult,
+    Document,
+    InviteResult,
+    Project,
+    ProjectDetails,
+    ProjectPatch,
+    CurrentUser,
+    User,
+    OAuth2TokenResponse,
+)
 from src.service import (
+    DBSession,
     add_user_to_project_,
+    add_users_to_project_,
+    blob_store,
+    cleanup_queue,
+    collect_blob_garbage,
+    create_document_,
     create_project_,
+    create_projects_,
+    decode_cursor,
     delete_project_,
-    get_project_,
+    document_storage,
+    encode_cursor,
+    get_cache_stats,
+    get_cached_project_details,
+    find_accessible_blobs_,
+    get_document_,
+    get_pool_stats,
+    get_read_session,
     get_session,
-    get_user,
     get_user_projects,
-    is_project_admin,
+    resolve_project_access,
+    run_db,
+    stream_user_projects,
     update_project_details_,
+    warm_up,
     create_user_,
-    authenticate_user,
+    authenticate_user_async,
+    issue_refresh_token_,
+    revoke_refresh_token_,
+    rotate_refresh_token_,
 )
+from src.settings import get_settings
+from src.storage import StoredFile, UploadTooLarge
+
+settings = get_settings()
+
 
-app = FastAPI()
-app.middleware("http")(auth_middleware)
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    get_database()
+    if settings.database_warm_up_connections:
+        await warm_up(settings.database_warm_up_connections)
+    cleanup_queue.start(settings.cleanup_workers)
+    yield
+    await cleanup_queue.stop(settings.cleanup_shutdown_timeout)
+    await close_database()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(AuthMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.post("/auth", status_code=status.HTTP_201_CREATED)
-async def create_user(create_user_request: User, db: Session = Depends(get_session)) -> None:
-    create_user_(db, create_user_request)
+async def create_user(create_user_request: User, db: DBSession = Depends(get_session)) -> None:
+    hashed_password = await hash_password_async(create_user_request.password)
+    await run_db(db, create_user_, create_user_request, hashed_password)
 
 
 @app.post("/token", response_model=OAuth2TokenResponse)
 async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_session)
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: DBSession = Depends(get_session)
 ) -> OAuth2TokenResponse:
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user_async(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Could not validate user {form_data.username}."
         )
-    exp_time = timedelta(minutes=30)
-    token = create_access_token(user.name, user.id, exp_time)
+    refresh_token = await run_db(db, issue_refresh_token_, user.id)
+    return _token_response(user.name, user.id, refresh_token)
+
+
+@app.post("/token/refresh", response_model=OAuth2TokenResponse)
+async def refresh_access_token(
+    refresh_token: Annotated[str, Form()], db: DBSession = Depends(get_session)
+) -> OAuth2TokenResponse:
+    rotated = await run_db(db, rotate_refresh_token_, refresh_token)
+    if rotated is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    return _token_response(rotated.user_name, rotated.user_id, rotated.refresh_token)
+
+
+@app.post("/token/revoke")
+async def revoke_refresh_token(token: Annotated[str, Form()], db: DBSession = Depends(get_session)) -> None:
+    await run_db(db, revoke_refresh_token_, token)
+
+
+def _token_response(name: str, user_id: uuid.UUID, refresh_token: str) -> OAuth2TokenResponse:
     return OAuth2TokenResponse(
-        access_token=token,
+        access_token=create_access_token(name, user_id, settings.access_token_expire),
         token_type="bearer",
-        expires_in=int(exp_time.total_seconds()),
-        refresh_token=None,
+        expires_in=int(settings.access_token_expire.total_seconds()),
+        refresh_token=refresh_token,
         scope="read write",
     )
 
 
-@app.get("/projects")
+@app.get("/projects", response_model=list[ProjectDetails])
 async def get_projects(
-    db: Session = Depends(get_session), current_user: CurrentUser = Depends(get_current_user)
-) -> list[ProjectDetails]:
-    user_projects = get_user_projects(db, current_user.id)
-    return [
-        ProjectDetails(project_id=project.id, name=project.name, description=project.description)
-        for project in user_projects
-    ]
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = Query(None),
+    name_prefix: str | None = Query(None),
+    if_none_match: str | None = Header(None),
+    db: DBSession = Depends(get_read_session),
+    current_user: CurrentUser = Depends(get_request_user),
+) -> ORJSONResponse:
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    user_projects = await run_db(db, get_user_projects, current_user.id, limit + 1, after, name_prefix)
+    has_more = len(user_projects) > limit
+    user_projects = user_projects[:limit]
+    etag = collection_etag(
+        limit, cursor, name_prefix, has_more, *(f"{row.id.hex}-{row.version}" for row in user_projects)
+    )
+    if etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    headers = {"ETag": etag}
+    if has_more:
+        headers["X-Next-Cursor"] = encode_cursor(user_projects[-1].id)
+    payload = [project_payload(row.id, row.name, row.description) for row in user_projects]
+    return ORJSONResponse(payload, headers=headers)
+
+
+async def _export_ndjson(user_id: uuid.UUID, compress: bool) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    async for rows in stream_user_projects(user_id):
+        chunk = b"".join(
+            orjson.dumps({"project_id": project_id, "name": name, "description": description}) + b"\n"
+            for project_id, name, description in rows
+        )
+        if compressor is None:
+            yield chunk
+            continue
+        compressed = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressed:
+            yield compressed
+    if compressor is not None:
+        yield compressor.flush()
+
+
+@app.get("/projects/export")
+async def export_projects(
+    gzip: bool = Query(False), current_user: CurrentUser = Depends(get_request_user)
+) -> StreamingResponse:
+    headers = {"Content-Encoding": "gzip"} if gzip else None
+    return StreamingResponse(_export_ndjson(current_user.id, gzip), media_type="application/x-ndjson", headers=headers)
 
 
-@app.post("/projects", status_code=201)
+@app.post("/projects", status_code=201, response_model=ProjectDetails)
 async def create_project(
-    project: Project, db: Session = Depends(get_session), current_user: CurrentUser = Depends(get_current_user)
-) -> ProjectDetails:
-    new_project = create_project_(project, db, current_user.id)
-    return ProjectDetails(**new_project.__dict__)
+    project: Project, db: DBSession = Depends(get_session), current_user: CurrentUser = Depends(get_request_user)
+) -> ORJSONResponse:
+    new_project = await run_db(db, lambda session: create_project_(project, session, current_user.id))
+    payload = project_payload(new_project.project_id, new_project.name, new_project.description)
+    headers = {"ETag": project_etag(new_project.project_id, new_project.version)}
+    return ORJSONResponse(payload, status_code=status.HTTP_201_CREATED, headers=headers)
 
 
-@app.get("/project/{project_id}/info")
+@app.post("/projects/batch")
+async def create_projects(
+    payload: list[dict[str, Any]] = Body(...),
+    db: DBSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_request_user),
+) -> list[BatchProjectResult]:
+    if len(payload) > settings.project_batch_max_size:
+        raise HTTPException(status_code=413, detail=f"At most {settings.project_batch_max_size} projects per batch")
+    results: list[BatchProjectResult] = []
+    valid: list[tuple[int, Project]] = []
+    for index, item in enumerate(payload):
+        try:
+            valid.append((index, Project.model_validate(item)))
+        except ValidationError as e:
+            error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results.append(BatchProjectResult(index=index, error=error))
+    projects = [project for _, project in valid]
+    project_ids = await run_db(db, lambda session: create_projects_(projects, session, current_user.id))
+    for (index, project), project_id in zip(valid, project_ids):
+        results.append(
+            BatchProjectResult(index=index, project=ProjectDetails(project_id=project_id, **project.model_dump()))
+        )
+    return sorted(results, key=lambda result: result.index)
+
+
+@app.get("/project/{project_id}/info", response_model=ProjectDetails)
 async def get_project_details(
-    project_id: uuid.UUID, db: Session = Depends(get_session), current_user: CurrentUser = Depends(get_current_user)
-) -> ProjectDetails:
-    project = get_project_(db, project_id, current_user.id)
+    project_id: uuid.UUID,
+    if_none_match: str | None = Header(None),
+    db: DBSession = Depends(get_read_session),
+    current_user: CurrentUser = Depends(get_request_user),
+) -> ORJSONResponse:
+    project = await get_cached_project_details(db, project_id, current_user.id)
     if project is None:
         raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
-    return ProjectDetails(**project.__dict__)
+    etag = project_etag(project_id, project.version)
+    if etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    payload = project_payload(project.project_id, project.name, project.description)
+    return ORJSONResponse(payload, headers={"ETag": etag})
+
+
+async def _update_project(
+    db: DBSession, project_id: uuid.UUID, user_id: uuid.UUID, changes: dict[str, Any], if_match: str | None
+) -> CachedProject:
+    versions = project_versions(if_match, project_id) if if_match is not None else None
+    project = await run_db(db, update_project_details_, project_id, user_id, changes, versions)
+    if project is not None:
+        return project
+    if await run_db(db, resolve_project_access, project_id, user_id) is None:
+        raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
+    raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Project has been modified")
 
 
 @app.put("/project/{project_id}/info")
 async def update_project_details(
     project_id: uuid.UUID,
     project_data: Project,
-    db: Session = Depends(get_session),
-    current_user: CurrentUser = Depends(get_current_user),
+    response: Response,
+    if_match: str | None = Header(None),
+    db: DBSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_request_user),
 ) -> None:
-    project = get_project_(db, project_id, current_user.id)
-    if project is None:
-        raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
-    update_project_details_(project, project_data, db)
+    changes = {field: value for field, value in project_data.model_dump().items() if value}
+    project = await _update_project(db, project_id, current_user.id, changes, if_match)
+    response.headers["ETag"] = project_etag(project_id, project.version)
+
+
+@app.patch("/project/{project_id}/info", response_model=ProjectDetails)
+async def patch_project_details(
+    project_id: uuid.UUID,
+    project_data: ProjectPatch,
+    if_match: str | None = Header(None),
+    db: DBSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_request_user),
+) -> ORJSONResponse:
+    changes = project_data.model_dump(exclude_unset=True)
+    project = await _update_project(db, project_id, current_user.id, changes, if_match)
+    payload = project_payload(project.project_id, project.name, project.description)
+    return ORJSONResponse(payload, headers={"ETag": project_etag(project_id, project.version)})
 
 
 @app.delete("/project/{project_id}", status_code=204)
 async def delete_project(
-    project_id: uuid.UUID, db: Session = Depends(get_session), current_user: CurrentUser = Depends(get_current_user)
+    project_id: uuid.UUID,
+    db: DBSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_request_user),
 ) -> None:
-    user_id = current_user.id
-    if not is_project_admin(db, project_id, user_id):
+    access = await run_db(db, resolve_project_access, project_id, current_user.id)
+    if access is None:
+        raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
+    if not access.is_admin:
         raise HTTPException(status_code=403, detail="Only project admins can delete projects")
-    project = get_project_(db, project_id, user_id)
-    if project is None:
+    file_paths = await run_db(db, delete_project_, project_id, current_user.id)
+    if file_paths is None:
         raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
-    delete_project_(project, db)
+    cleanup_queue.submit(collect_blob_garbage, file_paths)
 
 
 @app.post("/project/{project_id}/invite", status_code=201)
 async def add_user_to_project(
     project_id: uuid.UUID,
     user_email: str = Query(...),
-    db: Session = Depends(get_session),
-    current_user: CurrentUser = Depends(get_current_user),
+    db: DBSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_request_user),
 ) -> None:
-    user_to_add = get_user(user_email, db)
-    if not is_project_admin(db, project_id, current_user.id):
+    access = await run_db(db, resolve_project_access, project_id, current_user.id, user_email)
+    if access is None:
+        raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
+    if not access.is_admin:
         raise HTTPException(status_code=403, detail="Only project admins can share projects")
-    if user_to_add is None:
+    invitee_id = access.invitee_id
+    if invitee_id is None:
         raise HTTPException(status_code=404, detail=f"User with email {user_email} not found")
-    if get_project_(db, project_id, user_to_add.id):
+    if access.invitee_is_member:
         raise HTTPException(status_code=400, detail="User is already in this project")
-    add_user_to_project_(user_to_add, project_id, db)
+    await run_db(db, lambda session: add_user_to_project_(invitee_id, project_id, session))
+
+
+@app.post("/project/{project_id}/invite/batch")
+async def add_users_to_project(
+    project_id: uuid.UUID,
+    user_emails: list[str] = Body(...),
+    db: DBSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_request_user),
+) -> list[InviteResult]:
+    if len(user_emails) > settings.invite_batch_max_size:
+        raise HTTPException(status_code=413, detail=f"At most {settings.invite_batch_max_size} users per batch")
+    access = await run_db(db, resolve_project_access, project_id, current_user.id)
+    if access is None:
+        raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
+    if not access.is_admin:
+        raise HTTPException(status_code=403, detail="Only project admins can share projects")
+    unique_emails = list(dict.fromkeys(user_emails))
+    statuses = await run_db(db, lambda session: add_users_to_project_(unique_emails, project_id, session))
+    return [InviteResult(email=email, status=statuses[email]) for email in unique_emails]
+
+
+@app.post("/project/{project_id}/documents", status_code=201)
+async def upload_document(
+    project_id: uuid.UUID,
+    request: Request,
+    title: str = Query(...),
+    digest: str | None = Query(None, pattern="^[0-9a-f]{64}$"),
+    db: DBSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_request_user),
+) -> Document:
+    access = await run_db(db, resolve_project_access, project_id, current_user.id)
+    if access is None:
+        raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
+    staged = None
+    if digest is not None:
+        known_blobs = await run_db(db, find_accessible_blobs_, current_user.id, [digest])
+        if digest not in known_blobs:
+            raise HTTPException(status_code=404, detail=f"Content {digest} not found, upload the document body")
+    else:
+        await run_db(db, Session.close)
+        try:
+            staged = await blob_store.stage(request.stream(), settings.document_max_size)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        digest = staged.digest
+    document_id = uuid.uuid4()
+    try:
+        upload_size = staged.size if staged is not None else None
+        document = await run_db(db, create_document_, document_id, project_id, title, digest, upload_size)
+        if document is None:
+            raise HTTPException(status_code=404, detail=f"Content {digest} not found, upload the document body")
+        if staged is not None:
+            await blob_store.publish(staged)
+        await run_db(db, lambda session: session.commit())
+    finally:
+        if staged is not None:
+            await blob_store.discard(staged)
+    download_url = request.url_for("download_document", project_id=project_id, document_id=document_id)
+    return Document(document_id=document_id, title=title, file_path=AnyUrl(str(download_url)), digest=digest)
+
+
+@app.post("/project/{project_id}/documents/check")
+async def check_document_blobs(
+    project_id: uuid.UUID,
+    digests: list[str] = Body(...),
+    db: DBSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_request_user),
+) -> BlobCheckResult:
+    access = await run_db(db, resolve_project_access, project_id, current_user.id)
+    if access is None:
+        raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
+    known_blobs = await run_db(db, find_accessible_blobs_, current_user.id, digests)
+    return BlobCheckResult(
+        present=[digest for digest in digests if digest in known_blobs],
+        missing=[digest for digest in digests if digest not in known_blobs],
+    )
+
+
+@app.get("/project/{project_id}/documents/{document_id}")
+async def download_document(
+    project_id: uuid.UUID,
+    document_id: uuid.UUID,
+    request: Request,
+    db: DBSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_request_user),
+) -> Response:
+    document = await run_db(db, get_document_, project_id, document_id, current_user.id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    try:
+        stored_file = await document_storage.stat(document.file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    if document.blob_digest is not None:
+        stored_file = StoredFile(size=stored_file.size, etag=f'"{document.blob_digest}"')
+    return StorageFileResponse(document_storage, document.file_path, stored_file, request.headers, document.title)
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    return Response(request_metrics.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/internal/pool-stats", dependencies=[Depends(require_internal_access)])
+async def pool_stats() -> dict[str, Any]:
+    return get_pool_stats()
+
+
+@app.get("/internal/cache-stats", dependencies=[Depends(require_internal_access)])
+async def cache_stats() -> dict[str, Any]:
+    return get_cache_stats() | {"tokens": verified_tokens.stats()}
+
+
+@app.get("/internal/queue-stats", dependencies=[Depends(require_internal_access)])
+async def queue_stats() -> dict[str, Any]:
+    return {cleanup_queue.name: cleanup_queue.stats()}
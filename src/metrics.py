@@ -0,0 +1,215 @@
+import bisect
+import itertools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.settings import get_settings
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0.0, 1.0, 2.0, 3.0, 5.0, 10.0, 25.0, 50.0, 100.0)
+UNMATCHED_ROUTE = "unmatched"
+
+_db_timings: ContextVar[list[float] | None] = ContextVar("db_timings", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = list(itertools.accumulate(counts))
+        buckets = {str(bound): count for bound, count in zip(self.buckets, cumulative)}
+        buckets["+Inf"] = cumulative[-1]
+        return {"buckets": buckets, "count": cumulative[-1], "sum": total}
+
+
+@dataclass
+class RouteMetrics:
+    latency: Histogram = field(default_factory=lambda: Histogram(LATENCY_BUCKETS_S))
+    db_time: Histogram = field(default_factory=lambda: Histogram(LATENCY_BUCKETS_S))
+    db_queries: Histogram = field(default_factory=lambda: Histogram(QUERY_COUNT_BUCKETS))
+    statuses: Counter[str] = field(default_factory=Counter)
+    in_flight: int = 0
+
+
+class RequestMetrics:
+    def __init__(self) -> None:
+        self._routes: dict[tuple[str, str], RouteMetrics] = {}
+        self.db_reads: Counter[str] = Counter()
+        self.rejections: Counter[tuple[str, str, str]] = Counter()
+        self.timeouts: Counter[tuple[str, str]] = Counter()
+        self._lock = threading.Lock()
+
+    def route(self, method: str, path: str) -> RouteMetrics:
+        with self._lock:
+            metrics = self._routes.get((method, path))
+            if metrics is None:
+                metrics = self._routes[(method, path)] = RouteMetrics()
+            return metrics
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            routes = sorted(self._routes.items())
+        lines = [
+            "# HELP http_requests_total Requests handled, by route and status class.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, path), metrics in routes:
+            for status_class, count in sorted(metrics.statuses.items()):
+                lines.append(f"http_requests_total{{{_labels(method, path)},status={_quote(status_class)}}} {count}")
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being handled.",
+            "# TYPE http_requests_in_flight gauge",
+        ]
+        for (method, path), metrics in routes:
+            lines.append(f"http_requests_in_flight{{{_labels(method, path)}}} {metrics.in_flight}")
+        lines += _histogram_lines(
+            "http_request_duration_seconds", "Time until the response starts.", routes, lambda m: m.latency
+        )
+        lines += _histogram_lines(
+            "http_request_db_duration_seconds", "Time spent executing SQL per request.", routes, lambda m: m.db_time
+        )
+        lines += _histogram_lines(
+            "http_request_db_queries", "SQL statements executed per request.", routes, lambda m: m.db_queries
+        )
+        lines += [
+            "# HELP http_requests_rejected_total Requests rejected by admission control, by route and reason.",
+            "# TYPE http_requests_rejected_total counter",
+        ]
+        for (method, path, reason), count in sorted(self.rejections.items()):
+            lines.append(f"http_requests_rejected_total{{{_labels(method, path)},reason={_quote(reason)}}} {count}")
+        lines += [
+            "# HELP http_request_timeouts_total Requests that exceeded their deadline before responding.",
+            "# TYPE http_request_timeouts_total counter",
+        ]
+        for (method, path), count in sorted(self.timeouts.items()):
+            lines.append(f"http_request_timeouts_total{{{_labels(method, path)}}} {count}")
+        lines += [
+            "# HELP db_read_routing_total Read-only requests by the database they were routed to.",
+            "# TYPE db_read_routing_total counter",
+        ]
+        for target, count in sorted(self.db_reads.items()):
+            lines.append(f"db_read_routing_total{{target={_quote(target)}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def _labels(method: str, path: str) -> str:
+    return f"method={_quote(method)},route={_quote(path)}"
+
+
+def _histogram_lines(name: str, description: str, routes: list, histogram_of: Any) -> list[str]:
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+    for (method, path), metrics in routes:
+        labels = _labels(method, path)
+        snapshot = histogram_of(metrics).snapshot()
+        for bound, count in snapshot["buckets"].items():
+            lines.append(f"{name}_bucket{{{labels},le={_quote(bound)}}} {count}")
+        lines.append(f"{name}_sum{{{labels}}} {snapshot['sum']}")
+        lines.append(f"{name}_count{{{labels}}} {snapshot['count']}")
+    return lines
+
+
+request_metrics = RequestMetrics()
+
+
+def track_db_time(engine: Engine) -> None:
+    def before_cursor_execute(conn: Any, *_: Any) -> None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn: Any, *_: Any) -> None:
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        timings = _db_timings.get()
+        if timings is not None:
+            timings.append(elapsed)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+@contextmanager
+def count_queries() -> Iterator[list[float]]:
+    timings: list[float] = []
+    token = _db_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _db_timings.reset(token)
+
+
+def _match_route(request: Request) -> str:
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match is Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+
+def route_template(request: Request) -> str:
+    template = getattr(request.state, "route_template", None)
+    if template is None:
+        template = request.state.route_template = _match_route(request)
+    return template
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        metrics = request_metrics.route(request.method, route_template(request))
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        status_code = 500
+        with count_queries() as timings:
+
+            async def send_with_stats(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    if get_settings().query_stats_headers:
+                        db_time_ms = sum(timings) * 1000
+                        headers = MutableHeaders(scope=message)
+                        headers["X-DB-Queries"] = str(len(timings))
+                        headers["Server-Timing"] = f'db;dur={db_time_ms:.3f};desc="{len(timings)} queries"'
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                metrics.latency.observe(time.perf_counter() - start)
+                metrics.db_time.observe(sum(timings))
+                metrics.db_queries.observe(len(timings))
+                metrics.statuses[f"{status_code // 100}xx"] += 1
+                metrics.in_flight -= 1
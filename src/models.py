@@ -1,4 +1,5 @@
 import uuid
+from datetime import datetime
 
 import sqlalchemy as sa
 import sqlalchemy.dialects.postgresql as sa_di
@@ -15,10 +16,12 @@ class Projects(Base):
     id: Mapped[uuid.UUID] = mapped_column(sa_di.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: Mapped[str] = mapped_column(sa.String, nullable=False)
     description: Mapped[str] = mapped_column(sa.String, nullable=True)
+    version: Mapped[int] = mapped_column(sa.Integer, nullable=False, default=1)
     users_projects: Mapped[list["UserProject"]] = relationship(
         "UserProject", back_populates="projects", cascade="all, delete-orphan"
     )
     documents: Mapped[list["Documents"]] = relationship("Documents", back_populates="project")
+    __mapper_args__ = {"version_id_col": version}
 
 
 class Users(Base):
@@ -44,17 +47,47 @@ class UserProject(Base):
     users: Mapped["Users"] = relationship("Users", back_populates="users_projects")
     projects: Mapped["Projects"] = relationship("Projects", back_populates="users_projects")
     __table_args__ = (
-        sa.Index("idx_admin_per_project", "project_id", unique=True, postgresql_where=sa.text("is_admin = true")),
+        sa.Index(
+            "idx_admin_per_project",
+            "project_id",
+            unique=True,
+            postgresql_where=sa.text("is_admin = true"),
+            sqlite_where=sa.text("is_admin = 1"),
+        ),
+        sa.Index("idx_user_project_user_id_project_id", "user_id", "project_id"),
     )
 
 
+class RefreshTokens(Base):
+    __tablename__ = "refresh_tokens"
+
+    token_hash: Mapped[bytes] = mapped_column(sa.LargeBinary(32), primary_key=True)
+    family_id: Mapped[uuid.UUID] = mapped_column(sa_di.UUID(as_uuid=True), nullable=False, index=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        sa_di.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    rotated: Mapped[bool] = mapped_column(sa.Boolean, nullable=False, default=False)
+    expires_at: Mapped[datetime] = mapped_column(sa.DateTime(timezone=True), nullable=False)
+
+
+class Blobs(Base):
+    __tablename__ = "blobs"
+
+    digest: Mapped[str] = mapped_column(sa.String(64), primary_key=True)
+    size: Mapped[int] = mapped_column(sa.BigInteger, nullable=False)
+    ref_count: Mapped[int] = mapped_column(sa.Integer, nullable=False, default=0)
+
+
 class Documents(Base):
     __tablename__ = "documents"
 
     id: Mapped[uuid.UUID] = mapped_column(sa_di.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     project_id: Mapped[uuid.UUID] = mapped_column(
-        sa_di.UUID(as_uuid=True), sa.ForeignKey("projects.id"), nullable=False
+        sa_di.UUID(as_uuid=True), sa.ForeignKey("projects.id"), nullable=False, index=True
     )
     title: Mapped[str] = mapped_column(sa.String, nullable=False)
     file_path: Mapped[str] = mapped_column(sa.String, nullable=False)
+    blob_digest: Mapped[str | None] = mapped_column(
+        sa.String(64), sa.ForeignKey("blobs.digest"), nullable=True, index=True
+    )
     project: Mapped["Projects"] = relationship("Projects", back_populates="documents")
@@ -0,0 +1,91 @@
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from src.settings import get_settings
+
+settings = get_settings()
+_SCRYPT_BLOCK_SIZE = 8
+_SCRYPT_PARALLELISM = 1
+_SALT_SIZE = 16
+_KEY_SIZE = 32
+_LEGACY_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, cost: int, block_size: int, parallelism: int) -> bytes:
+    n = 1 << cost
+    return hashlib.scrypt(
+        password.encode(),
+        salt=salt,
+        n=n,
+        r=block_size,
+        p=parallelism,
+        maxmem=256 * n * block_size * parallelism,
+        dklen=_KEY_SIZE,
+    )
+
+
+def hash_password(password: str, cost: int | None = None) -> str:
+    cost = settings.password_hash_cost if cost is None else cost
+    salt = os.urandom(_SALT_SIZE)
+    key = _scrypt(password, salt, cost, _SCRYPT_BLOCK_SIZE, _SCRYPT_PARALLELISM)
+    params = f"ln={cost},r={_SCRYPT_BLOCK_SIZE},p={_SCRYPT_PARALLELISM}"
+    return f"scrypt${params}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def verify_password(password: str, hashed_password: str) -> tuple[bool, bool]:
+    if _LEGACY_SHA256.fullmatch(hashed_password):
+        legacy_hash = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy_hash, hashed_password), True
+    try:
+        scheme, params, salt, key = hashed_password.split("$")
+        options = dict(option.split("=") for option in params.split(","))
+        cost, block_size, parallelism = int(options["ln"]), int(options["r"]), int(options["p"])
+        salt_bytes, expected = _b64decode(salt), _b64decode(key)
+    except (KeyError, ValueError):
+        return False, False
+    if scheme != "scrypt":
+        return False, False
+    candidate = _scrypt(password, salt_bytes, cost, block_size, parallelism)
+    needs_rehash = (cost, block_size, parallelism) != (
+        settings.password_hash_cost,
+        _SCRYPT_BLOCK_SIZE,
+        _SCRYPT_PARALLELISM,
+    )
+    return hmac.compare_digest(candidate, expected), needs_rehash
+
+
+@functools.cache
+def _dummy_hash() -> str:
+    return hash_password("dummy-password")
+
+
+def burn_verification(password: str) -> None:
+    verify_password(password, _dummy_hash())
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_executor, hash_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> tuple[bool, bool]:
+    return await asyncio.get_running_loop().run_in_executor(_executor, verify_password, password, hashed_password)
+
+
+async def burn_verification_async(password: str) -> None:
+    await asyncio.get_running_loop().run_in_executor(_executor, burn_verification, password)
@@ -0,0 +1,88 @@
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry, QueuePool
+
+from src.metrics import Histogram
+
+WAIT_TIME_BUCKETS_MS = (1.0, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0, 10000.0)
+
+
+class PoolStats:
+    def __init__(self, engine: Engine) -> None:
+        self._engine = engine
+        self._lock = threading.Lock()
+        self.wait_time_ms = Histogram(WAIT_TIME_BUCKETS_MS)
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waiting = 0
+
+    def incr(self, counter: str, delta: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + delta)
+
+    def snapshot(self) -> dict[str, Any]:
+        pool = self._engine.pool
+        live: dict[str, Any] = {}
+        if isinstance(pool, QueuePool):
+            live = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            }
+        return live | {
+            "waiting": self.waiting,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "wait_time_ms": self.wait_time_ms.snapshot(),
+        }
+
+
+class InstrumentedQueuePool(QueuePool):
+    pool_stats: PoolStats | None = None
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        stats = self.pool_stats
+        if stats is None:
+            return super()._do_get()
+        stats.incr("waiting")
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            stats.incr("timeouts")
+            raise
+        finally:
+            stats.incr("waiting", -1)
+            stats.wait_time_ms.observe((time.perf_counter() - start) * 1000)
+
+    def recreate(self) -> QueuePool:
+        pool = super().recreate()
+        if isinstance(pool, InstrumentedQueuePool):
+            pool.pool_stats = self.pool_stats
+        return pool
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine: Engine) -> PoolStats:
+    stats = PoolStats(engine)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.pool_stats = stats
+    event.listen(engine, "connect", lambda *_: stats.incr("connects"))
+    event.listen(engine, "checkout", lambda *_: stats.incr("checkouts"))
+    event.listen(engine, "checkin", lambda *_: stats.incr("checkins"))
+    event.listen(engine, "invalidate", lambda *_: stats.incr("invalidations"))
+    return stats
@@ -0,0 +1,131 @@
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Protocol
+
+from fastapi.responses import ORJSONResponse
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.cache import LRUCache
+from src.database import Database, get_database
+from src.metrics import request_metrics, route_template
+from src.settings import get_settings
+
+ROUTE_COSTS: dict[tuple[str, str], float] = {
+    ("GET", "/projects/export"): 10,
+    ("POST", "/projects/batch"): 10,
+    ("POST", "/project/{project_id}/invite/batch"): 10,
+    ("POST", "/project/{project_id}/documents"): 5,
+}
+UNLIMITED_ROUTES = {"/metrics"}
+
+
+class RateLimitBackend(Protocol):
+    async def acquire(self, key: str, cost: float, rate: float, burst: float) -> float: ...
+
+    def stats(self) -> dict[str, int | float]: ...
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated_at: float
+
+
+class InProcessRateLimitBackend:
+    def __init__(self, maxsize: int, timer: Callable[[], float] = time.monotonic) -> None:
+        self._buckets: LRUCache[str, _Bucket] = LRUCache(maxsize)
+        self._timer = timer
+        self._lock = threading.Lock()
+
+    async def acquire(self, key: str, cost: float, rate: float, burst: float) -> float:
+        cost = min(cost, burst)
+        now = self._timer()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = _Bucket(burst, now)
+                self._buckets.set(key, bucket)
+            bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated_at) * rate)
+            bucket.updated_at = now
+            if bucket.tokens >= cost:
+                bucket.tokens -= cost
+                return 0.0
+            return (cost - bucket.tokens) / rate
+
+    def stats(self) -> dict[str, int | float]:
+        return self._buckets.stats()
+
+
+def _pool_waiters() -> int:
+    waiters = 0
+    database: Database | None = get_database()
+    while database is not None:
+        waiters += database.pool_stats.waiting
+        if database.async_pool_stats is not None:
+            waiters += database.async_pool_stats.waiting
+        database = database.replica
+    return waiters
+
+
+class AdmissionController:
+    def __init__(self, backend: RateLimitBackend) -> None:
+        self.backend = backend
+        self.in_flight = 0
+
+    def overload_reason(self) -> str | None:
+        settings = get_settings()
+        if settings.max_in_flight_requests and self.in_flight >= settings.max_in_flight_requests:
+            return "in_flight"
+        if settings.max_pool_waiters and _pool_waiters() >= settings.max_pool_waiters:
+            return "pool_waiters"
+        return None
+
+    async def retry_after(self, request: Request, route: str) -> float:
+        settings = get_settings()
+        user = getattr(request.state, "user", None)
+        if user is None or settings.rate_limit_per_second <= 0:
+            return 0.0
+        cost = ROUTE_COSTS.get((request.method, route), 1)
+        return await self.backend.acquire(str(user.id), cost, settings.rate_limit_per_second, settings.rate_limit_burst)
+
+
+admission = AdmissionController(InProcessRateLimitBackend(get_settings().rate_limit_buckets))
+
+
+def _reject(request: Request, route: str, reason: str, status_code: int, retry_after: float) -> Response:
+    request_metrics.rejections[(request.method, route, reason)] += 1
+    detail = "Rate limit exceeded" if status_code == 429 else "Server is overloaded, retry later"
+    headers = {"Retry-After": str(max(1, math.ceil(retry_after)))}
+    return ORJSONResponse({"detail": detail}, status_code=status_code, headers=headers)
+
+
+class AdmissionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        route = route_template(request)
+        if route in UNLIMITED_ROUTES:
+            await self.app(scope, receive, send)
+            return
+        reason = admission.overload_reason()
+        if reason is not None:
+            await _reject(request, route, reason, 503, get_settings().overload_retry_after)(scope, receive, send)
+            return
+        retry_after = await admission.retry_after(request, route)
+        if retry_after > 0:
+            await _reject(request, route, "rate_limited", 429, retry_after)(scope, receive, send)
+            return
+        admission.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.in_flight -= 1
@@ -0,0 +1,135 @@
+import hashlib
+import uuid
+from typing import Any, Mapping
+from urllib.parse import quote
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from src.storage import Storage, StoredFile
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(range_header: str, size: int) -> tuple[int, int] | None:
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                raise RangeNotSatisfiable
+            return max(size - suffix, 0), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def project_payload(project_id: uuid.UUID, name: str, description: str | None) -> dict[str, Any]:
+    return {"name": name, "description": description, "project_id": project_id}
+
+
+def project_etag(project_id: uuid.UUID, version: int) -> str:
+    return f'"{project_id.hex}-{version}"'
+
+
+def project_versions(if_match: str, project_id: uuid.UUID) -> list[int] | None:
+    if if_match.strip() == "*":
+        return None
+    prefix = f'"{project_id.hex}-'
+    versions = []
+    for tag in (tag.strip() for tag in if_match.split(",")):
+        version = tag.removeprefix(prefix).removesuffix('"')
+        if tag.startswith(prefix) and tag.endswith('"') and version.isdigit():
+            versions.append(int(version))
+    return versions
+
+
+def collection_etag(*parts: object) -> str:
+    return '"' + hashlib.sha256(":".join(map(str, parts)).encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(header: str | None, etag: str, weak: bool = True) -> bool:
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in header.split(","))
+    return etag in (tag.removeprefix("W/") if weak else tag for tag in tags)
+
+
+class StorageFileResponse(Response):
+    def __init__(
+        self,
+        storage: Storage,
+        key: str,
+        stored_file: StoredFile,
+        request_headers: Mapping[str, str],
+        filename: str,
+        media_type: str = "application/octet-stream",
+    ) -> None:
+        self.storage = storage
+        self.key = key
+        self.media_type = media_type
+        self.background = None
+        self.start, self.length = 0, stored_file.size
+        self.status_code = 200
+        self.init_headers(
+            {
+                "accept-ranges": "bytes",
+                "etag": stored_file.etag,
+                "content-disposition": f"attachment; filename*=utf-8''{quote(filename)}",
+            }
+        )
+        if request_headers.get("if-none-match") == stored_file.etag:
+            self.status_code, self.length = 304, 0
+            return
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header is None or (if_range is not None and if_range != stored_file.etag):
+            self.headers["content-length"] = str(stored_file.size)
+            return
+        try:
+            byte_range = parse_range(range_header, stored_file.size)
+        except RangeNotSatisfiable:
+            self.status_code, self.length = 416, 0
+            self.headers["content-range"] = f"bytes */{stored_file.size}"
+            self.headers["content-length"] = "0"
+            return
+        if byte_range is None:
+            self.headers["content-length"] = str(stored_file.size)
+            return
+        start, end = byte_range
+        self.status_code, self.start, self.length = 206, start, end - start + 1
+        self.headers["content-range"] = f"bytes {start}-{end}/{stored_file.size}"
+        self.headers["content-length"] = str(self.length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        extensions = scope.get("extensions") or {}
+        path = self.storage.local_path(self.key)
+        if path is not None and "http.response.zerocopy" in extensions:
+            file = await anyio.to_thread.run_sync(open, path, "rb")
+            try:
+                await send({"type": "http.response.zerocopy", "file": file, "offset": self.start, "count": self.length})
+            finally:
+                await anyio.to_thread.run_sync(file.close)
+            return
+        if path is not None and "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": str(path)})
+            return
+        async for chunk in self.storage.read(self.key, self.start, self.length):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
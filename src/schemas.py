@@ -1,6 +1,7 @@
 import uuid
+from typing import Literal
 
-from pydantic import AnyUrl, BaseModel, EmailStr, Field
+from pydantic import AnyUrl, BaseModel, EmailStr, Field, field_validator
 
 
 class Project(BaseModel):
@@ -8,10 +9,33 @@ class Project(BaseModel):
     description: str | None = None
 
 
+class ProjectPatch(BaseModel):
+    name: str | None = None
+    description: str | None = None
+
+    @field_validator("name")
+    @classmethod
+    def name_not_null(cls, name: str | None) -> str:
+        if name is None:
+            raise ValueError("name cannot be null")
+        return name
+
+
 class ProjectDetails(Project):
     project_id: uuid.UUID = Field(default_factory=uuid.uuid4)
 
 
+class BatchProjectResult(BaseModel):
+    index: int
+    project: ProjectDetails | None = None
+    error: str | None = None
+
+
+class InviteResult(BaseModel):
+    email: str
+    status: Literal["added", "already_member", "not_found"]
+
+
 class User(BaseModel):
     name: str
     email: EmailStr
@@ -26,6 +50,12 @@ class Document(BaseModel):
     document_id: uuid.UUID = Field(default_factory=uuid.uuid4)
     title: str
     file_path: AnyUrl
+    digest: str | None = None
+
+
+class BlobCheckResult(BaseModel):
+    present: list[str]
+    missing: list[str]
 
 
 class OAuth2TokenResponse(BaseModel):
@@ -1,116 +1,623 @@
-import os
+import base64
+import binascii
 import uuid
-from typing import Generator
-from dotenv import load_dotenv
-from sqlalchemy import and_, create_engine, select
-from sqlalchemy.orm import Session, sessionmaker
-import hashlib
-from src.models import Projects, UserProject, Users
-from src.schemas import Project, User
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Concatenate, Iterator, Literal, Sequence
 
-load_dotenv()
+import anyio
+from fastapi import Depends, Request
+from sqlalchemy import Row, Select, and_, delete, func, insert, literal, select, true, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from src.cache import (
+    CachedProject,
+    InProcessMembershipCache,
+    InProcessProjectDetailsCache,
+    MembershipCache,
+    MembershipRole,
+    ProjectDetailsCache,
+    SingleFlight,
+)
+from src.auth import get_request_user, new_refresh_token, refresh_token_digest
+from src.database import READ_YOUR_WRITES_COOKIE, Database, ReadTarget, get_database, read_router
+from src.deadlines import run_interruptible
+from src.models import Blobs, Documents, Projects, RefreshTokens, UserProject, Users
+from src.passwords import burn_verification_async, hash_password_async, verify_password_async
+from src.schemas import CurrentUser, Project, User
+from src.settings import get_settings
+from src.storage import BlobStore, LocalStorage, Storage, blob_key
+from src.worker import JobQueue
 
-POSTGRES_USER = os.environ.get("POSTGRES_USER", "")
-POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASSWORD", "")
-POSTGRES_DB = os.environ.get("POSTGRES_DB", "")
-POSTGRES_PORT = os.environ.get("POSTGRES_PORT", "5432")
-POSTGRES_SERVER = os.environ.get("POSTGRES_SERVER", "localhost")
+settings = get_settings()
 
-DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
+membership_cache: MembershipCache = InProcessMembershipCache(
+    settings.membership_cache_size, settings.membership_cache_ttl
+)
+project_details_cache: ProjectDetailsCache = InProcessProjectDetailsCache(
+    settings.project_cache_size, settings.project_cache_ttl
+)
+project_details_loads: SingleFlight[tuple[uuid.UUID, int, bool], CachedProject | None] = SingleFlight()
+document_storage: Storage = LocalStorage(Path(settings.document_storage_path))
+blob_store = BlobStore(document_storage)
+cleanup_queue = JobQueue("cleanup")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+type DBSession = Session | AsyncSession
 
 
-def get_session() -> Generator[Session]:
-    with SessionLocal() as session:
+@asynccontextmanager
+async def _database_session(database: Database, replica: bool = False) -> AsyncIterator[DBSession]:
+    if database.async_session_factory is not None:
+        async_session = database.async_session_factory(info={"replica": replica})
+        try:
+            yield async_session
+        finally:
+            with anyio.CancelScope(shield=True):
+                await async_session.close()
+        return
+    session = database.session_factory(info={"replica": replica})
+    try:
         yield session
+    finally:
+        with anyio.CancelScope(shield=True):
+            await run_in_threadpool(session.close)
 
 
-def get_project_(db: Session, project_id: uuid.UUID, user_id: uuid.UUID) -> Projects | None:
-    query = select(Projects).join(UserProject).where(and_(Projects.id == project_id, UserProject.user_id == user_id))
-    return db.execute(query).scalar_one_or_none()
+async def get_session() -> AsyncGenerator[DBSession]:
+    async with _database_session(get_database()) as session:
+        yield session
+
+
+async def get_read_session(
+    request: Request, current_user: CurrentUser = Depends(get_request_user)
+) -> AsyncGenerator[DBSession]:
+    database = get_database()
+    last_write = request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    if read_router.route(database, current_user.id, last_write) is ReadTarget.REPLICA and database.replica is not None:
+        database = database.replica
+        replica = True
+    else:
+        replica = False
+    async with _database_session(database, replica) as session:
+        yield session
+
+
+def _from_replica(db: DBSession) -> bool:
+    return db.info.get("replica") is True
+
+
+def get_cache_stats() -> dict[str, Any]:
+    return {
+        "membership": membership_cache.stats(),
+        "project_details": project_details_cache.stats() | {"shared_loads": project_details_loads.shared},
+    }
+
+
+open_session = asynccontextmanager(get_session)
+
+
+def get_pool_stats() -> dict[str, Any]:
+    database = get_database()
+    stats = {"sync": database.pool_stats.snapshot()}
+    if database.async_pool_stats is not None:
+        stats["async"] = database.async_pool_stats.snapshot()
+    if database.replica is not None:
+        stats["replica"] = {"sync": database.replica.pool_stats.snapshot()}
+        if database.replica.async_pool_stats is not None:
+            stats["replica"]["async"] = database.replica.async_pool_stats.snapshot()
+    return stats
+
+
+async def run_db[**P, T](
+    db: DBSession, fn: Callable[Concatenate[Session, P], T], *args: P.args, **kwargs: P.kwargs
+) -> T:
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_interruptible(fn, db, *args, **kwargs)
+
 
+@dataclass(frozen=True, slots=True)
+class ProjectAccess:
+    project_id: uuid.UUID
+    is_admin: bool
+    invitee_id: uuid.UUID | None = None
+    invitee_is_member: bool = False
 
-def is_project_admin(db: Session, project_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+
+def _cache_membership(
+    db: Session, user_id: uuid.UUID, project_id: uuid.UUID, is_admin: bool | None, generation: int
+) -> None:
+    if _from_replica(db):
+        return
+    if is_admin is None:
+        role = MembershipRole.NONE
+    else:
+        role = MembershipRole.ADMIN if is_admin else MembershipRole.MEMBER
+    membership_cache.set(user_id, project_id, role, generation)
+
+
+def _invitee_query(project_id: uuid.UUID, invitee_email: str) -> Select[tuple[uuid.UUID, uuid.UUID]]:
+    return (
+        select(Users.id, UserProject.user_id)
+        .outerjoin(UserProject, and_(UserProject.project_id == project_id, UserProject.user_id == Users.id))
+        .where(Users.email == invitee_email)
+    )
+
+
+def resolve_project_access(
+    db: Session, project_id: uuid.UUID, user_id: uuid.UUID, invitee_email: str | None = None
+) -> ProjectAccess | None:
+    generation = membership_cache.generation
+    role = membership_cache.get(user_id, project_id)
+    if role is MembershipRole.NONE:
+        return None
+    if role is not None:
+        is_admin = role is MembershipRole.ADMIN
+        if invitee_email is None or not is_admin:
+            return ProjectAccess(project_id=project_id, is_admin=is_admin)
+        found = db.execute(_invitee_query(project_id, invitee_email)).one_or_none()
+        invitee_id, invitee_member_id = found if found is not None else (None, None)
+        return ProjectAccess(
+            project_id=project_id,
+            is_admin=True,
+            invitee_id=invitee_id,
+            invitee_is_member=invitee_member_id is not None,
+        )
+
+    caller = aliased(UserProject)
+    query = (
+        select(caller.is_admin).select_from(caller).where(caller.project_id == project_id, caller.user_id == user_id)
+    )
+    if invitee_email is None:
+        row = db.execute(query).one_or_none()
+        _cache_membership(db, user_id, project_id, row[0] if row is not None else None, generation)
+        return ProjectAccess(project_id=project_id, is_admin=bool(row[0])) if row is not None else None
+
+    invitee = aliased(Users)
+    invitee_membership = aliased(UserProject)
     query = (
-        select(Projects)
-        .join(
-            UserProject,
-            and_(
-                UserProject.project_id == Projects.id,
-                UserProject.user_id == user_id,
-                UserProject.is_admin.is_(True),
-            ),
+        query.add_columns(invitee.id, invitee_membership.user_id)
+        .outerjoin(invitee, invitee.email == invitee_email)
+        .outerjoin(
+            invitee_membership,
+            and_(invitee_membership.project_id == project_id, invitee_membership.user_id == invitee.id),
         )
+    )
+    invitee_row = db.execute(query).one_or_none()
+    _cache_membership(db, user_id, project_id, invitee_row[0] if invitee_row is not None else None, generation)
+    if invitee_row is None:
+        return None
+    is_admin, invitee_id, invitee_member_id = invitee_row
+    return ProjectAccess(
+        project_id=project_id,
+        is_admin=bool(is_admin),
+        invitee_id=invitee_id,
+        invitee_is_member=invitee_member_id is not None,
+    )
+
+
+_project_columns = (Projects.id, Projects.name, Projects.description, Projects.version)
+
+
+def load_project_details_(db: Session, project_id: uuid.UUID) -> CachedProject | None:
+    generation = project_details_cache.generation
+    row = db.execute(select(*_project_columns).where(Projects.id == project_id)).one_or_none()
+    if row is None:
+        return None
+    project = CachedProject(*row)
+    if not _from_replica(db):
+        project_details_cache.set(project, generation)
+    return project
+
+
+def load_accessible_project_details_(db: Session, project_id: uuid.UUID, user_id: uuid.UUID) -> CachedProject | None:
+    generation = project_details_cache.generation
+    membership_generation = membership_cache.generation
+    query = (
+        select(*_project_columns, UserProject.is_admin)
+        .join(UserProject, and_(UserProject.project_id == Projects.id, UserProject.user_id == user_id))
         .where(Projects.id == project_id)
     )
-    return db.execute(query).one_or_none() is not None
+    row = db.execute(query).one_or_none()
+    _cache_membership(db, user_id, project_id, row[4] if row is not None else None, membership_generation)
+    if row is None:
+        return None
+    project = CachedProject(*row[:4])
+    if not _from_replica(db):
+        project_details_cache.set(project, generation)
+    return project
 
 
-def create_project_(project: Project, db: Session, creator_id: uuid.UUID) -> Projects:
-    new_project = Projects(name=project.name, description=project.description)
-    db.add(new_project)
-    db.flush()
-    user_project = UserProject(project_id=new_project.id, user_id=creator_id, is_admin=True)
-    db.add(user_project)
-    db.commit()
-    db.refresh(new_project)
-    return new_project
+async def get_cached_project_details(db: DBSession, project_id: uuid.UUID, user_id: uuid.UUID) -> CachedProject | None:
+    role = membership_cache.get(user_id, project_id)
+    if role is MembershipRole.NONE:
+        return None
+    if role is None:
+        return await run_db(db, load_accessible_project_details_, project_id, user_id)
+    cached = project_details_cache.get(project_id)
+    if cached is not None:
+        return cached
+    key = (project_id, project_details_cache.generation, _from_replica(db))
+    return await project_details_loads.do(key, lambda: run_db(db, load_project_details_, project_id))
 
 
-def get_user_projects(db: Session, user_id: uuid.UUID) -> list[Projects]:
-    query = select(Projects).join(UserProject).where(UserProject.user_id == user_id)
-    return list(db.execute(query).scalars().all())
+def create_project_(project: Project, db: Session, creator_id: uuid.UUID) -> CachedProject:
+    project_id = uuid.uuid4()
+    new_project = (
+        insert(Projects)
+        .values(id=project_id, name=project.name, description=project.description, version=1)
+        .returning(Projects.id, Projects.name, Projects.description, Projects.version)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        created = new_project.cte("new_project")
+        membership = insert(UserProject).from_select(
+            [UserProject.project_id, UserProject.user_id, UserProject.is_admin],
+            select(created.c.id, literal(creator_id, UserProject.user_id.type), true()),
+        )
+        row = db.execute(select(created).add_cte(membership.cte("new_membership"))).one()
+    else:
+        row = db.execute(new_project).one()
+        db.execute(insert(UserProject).values(project_id=project_id, user_id=creator_id, is_admin=True))
+    db.commit()
+    membership_cache.invalidate(creator_id, project_id)
+    return CachedProject(*row)
 
 
-def update_project_details_(project: Projects, project_data: Project, db: Session) -> None:
-    project = db.merge(project)
-    if project_data.name:
-        project.name = project_data.name
-    if project_data.description:
-        project.description = project_data.description
+def create_projects_(projects: list[Project], db: Session, creator_id: uuid.UUID) -> list[uuid.UUID]:
+    if not projects:
+        return []
+    project_ids = [uuid.uuid4() for _ in projects]
+    db.execute(
+        insert(Projects),
+        [
+            {"id": project_id, "name": project.name, "description": project.description}
+            for project_id, project in zip(project_ids, projects)
+        ],
+    )
+    db.execute(
+        insert(UserProject),
+        [{"project_id": project_id, "user_id": creator_id, "is_admin": True} for project_id in project_ids],
+    )
     db.commit()
-    db.refresh(project)
+    for project_id in project_ids:
+        membership_cache.invalidate(creator_id, project_id)
+    return project_ids
+
+
+def encode_cursor(project_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(project_id.bytes).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(bytes=base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+type ProjectRow = Row[tuple[uuid.UUID, str, str]]
+type VersionedProjectRow = Row[tuple[uuid.UUID, str, str, int]]
+
+
+def get_user_projects(
+    db: Session,
+    user_id: uuid.UUID,
+    limit: int | None = None,
+    after: uuid.UUID | None = None,
+    name_prefix: str | None = None,
+) -> list[VersionedProjectRow]:
+    query = (
+        select(Projects.id, Projects.name, Projects.description, Projects.version)
+        .join(UserProject)
+        .where(UserProject.user_id == user_id)
+        .order_by(UserProject.project_id)
+    )
+    if after is not None:
+        query = query.where(UserProject.project_id > after)
+    if name_prefix:
+        query = query.where(Projects.name.startswith(name_prefix, autoescape=True))
+    if limit is not None:
+        query = query.limit(limit)
+    return list(db.execute(query).all())
+
+
+def _export_query(user_id: uuid.UUID, batch_size: int) -> Select[tuple[uuid.UUID, str, str]]:
+    return (
+        select(Projects.id, Projects.name, Projects.description)
+        .join(UserProject)
+        .where(UserProject.user_id == user_id)
+        .order_by(UserProject.project_id)
+        .execution_options(yield_per=batch_size)
+    )
+
+
+def _iter_partitions(query: Select[tuple[uuid.UUID, str, str]]) -> Iterator[Sequence[ProjectRow]]:
+    with get_database().session_factory() as session:
+        yield from session.execute(query).partitions()
+
 
+async def stream_user_projects(
+    user_id: uuid.UUID, batch_size: int | None = None
+) -> AsyncIterator[Sequence[ProjectRow]]:
+    query = _export_query(user_id, batch_size or settings.export_batch_size)
+    database = get_database()
+    if database.async_session_factory is not None:
+        async with database.async_session_factory() as async_session:
+            result = await async_session.stream(query)
+            async for partition in result.partitions():
+                yield partition
+        return
+    async for partition in iterate_in_threadpool(_iter_partitions(query)):
+        yield partition
 
-def delete_project_(project: Projects, db: Session) -> None:
-    db.query(UserProject).filter(UserProject.project_id == project.id).delete()
-    db.delete(project)
+
+def update_project_details_(
+    db: Session,
+    project_id: uuid.UUID,
+    user_id: uuid.UUID,
+    changes: dict[str, Any],
+    versions: Sequence[int] | None = None,
+) -> CachedProject | None:
+    is_member = (
+        select(UserProject.project_id)
+        .where(UserProject.project_id == Projects.id, UserProject.user_id == user_id)
+        .exists()
+    )
+    conditions = [Projects.id == project_id, is_member]
+    if versions is not None:
+        conditions.append(Projects.version.in_(versions))
+    if not changes:
+        row = db.execute(select(*_project_columns).where(*conditions)).one_or_none()
+        return CachedProject(*row) if row is not None else None
+    query = (
+        update(Projects).where(*conditions).values(**changes, version=Projects.version + 1).returning(*_project_columns)
+    )
+    row = db.execute(query.execution_options(synchronize_session=False)).one_or_none()
     db.commit()
+    if row is None:
+        return None
+    project_details_cache.invalidate(project_id)
+    return CachedProject(*row)
 
 
-def hash_password(password: str) -> str:
-    h = hashlib.new("SHA256")
-    h.update(password.encode())
-    return h.hexdigest()
+def delete_project_(db: Session, project_id: uuid.UUID, user_id: uuid.UUID) -> list[str] | None:
+    query = (
+        delete(UserProject)
+        .where(UserProject.project_id == project_id)
+        .returning(UserProject.user_id, UserProject.is_admin)
+    )
+    members = db.execute(query.execution_options(synchronize_session=False)).all()
+    if not any(member_id == user_id and is_admin for member_id, is_admin in members):
+        db.rollback()
+        membership_cache.invalidate(user_id, project_id)
+        return None
+    project_documents = select(Documents.blob_digest).where(Documents.project_id == project_id)
+    released = (
+        select(func.count())
+        .where(Documents.project_id == project_id, Documents.blob_digest == Blobs.digest)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Blobs)
+        .where(Blobs.digest.in_(project_documents))
+        .values(ref_count=Blobs.ref_count - released)
+        .execution_options(synchronize_session=False)
+    )
+    documents = db.execute(
+        delete(Documents)
+        .where(Documents.project_id == project_id)
+        .returning(Documents.blob_digest, Documents.file_path)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.execute(delete(Projects).where(Projects.id == project_id).execution_options(synchronize_session=False))
+    db.commit()
+    project_details_cache.invalidate(project_id)
+    for member_id, _ in members:
+        membership_cache.invalidate(member_id, project_id)
+    return [file_path for digest, file_path in documents if digest is None]
 
 
-def create_user_(db: Session, create_user_request: User) -> None:
+def create_user_(db: Session, create_user_request: User, hashed_password: str) -> None:
     create_user_model = Users(
         id=uuid.uuid4(),
         name=create_user_request.name,
         email=create_user_request.email,
-        hashed_password=hash_password(create_user_request.password),
+        hashed_password=hashed_password,
     )
     db.add(create_user_model)
     db.commit()
 
 
-def authenticate_user(username: str, password: str, db: Session) -> Users | None:
-    user = get_user(username, db)
-    if not user:
+def update_password_hash_(db: Session, user_id: uuid.UUID, hashed_password: str) -> None:
+    db.execute(update(Users).where(Users.id == user_id).values(hashed_password=hashed_password))
+    db.commit()
+
+
+async def authenticate_user_async(username: str, password: str, db: DBSession) -> Users | None:
+    user = await run_db(db, lambda session: get_user(username, session))
+    if user is None:
+        await burn_verification_async(password)
         return None
-    if hash_password(password) != user.hashed_password:
+    is_valid, needs_rehash = await verify_password_async(password, user.hashed_password)
+    if not is_valid:
         return None
+    if needs_rehash:
+        await run_db(db, update_password_hash_, user.id, await hash_password_async(password))
     return user
 
 
+@dataclass
+class RotatedRefreshToken:
+    user_id: uuid.UUID
+    user_name: str
+    refresh_token: str
+
+
+def issue_refresh_token_(db: Session, user_id: uuid.UUID, family_id: uuid.UUID | None = None) -> str:
+    refresh_token = new_refresh_token()
+    now = datetime.now(timezone.utc)
+    db.execute(delete(RefreshTokens).where(RefreshTokens.user_id == user_id, RefreshTokens.expires_at <= now))
+    db.execute(
+        insert(RefreshTokens).values(
+            token_hash=refresh_token_digest(refresh_token),
+            family_id=family_id or uuid.uuid4(),
+            user_id=user_id,
+            rotated=False,
+            expires_at=now + settings.refresh_token_expire,
+        )
+    )
+    db.commit()
+    return refresh_token
+
+
+def rotate_refresh_token_(db: Session, refresh_token: str) -> RotatedRefreshToken | None:
+    user_name = select(Users.name).where(Users.id == RefreshTokens.user_id).scalar_subquery()
+    row = db.execute(
+        update(RefreshTokens)
+        .where(
+            RefreshTokens.token_hash == refresh_token_digest(refresh_token),
+            RefreshTokens.rotated.is_(False),
+            RefreshTokens.expires_at > datetime.now(timezone.utc),
+        )
+        .values(rotated=True)
+        .returning(RefreshTokens.user_id, RefreshTokens.family_id, user_name)
+    ).one_or_none()
+    if row is None:
+        revoke_refresh_token_(db, refresh_token)
+        return None
+    user_id, family_id, name = row
+    return RotatedRefreshToken(user_id, name, issue_refresh_token_(db, user_id, family_id))
+
+
+def revoke_refresh_token_(db: Session, refresh_token: str) -> None:
+    family = select(RefreshTokens.family_id).where(RefreshTokens.token_hash == refresh_token_digest(refresh_token))
+    db.execute(delete(RefreshTokens).where(RefreshTokens.family_id.in_(family)))
+    db.commit()
+
+
 def get_user(user_email: str, db: Session) -> Users | None:
     return db.query(Users).filter(Users.email == user_email).one_or_none()
 
 
-def add_user_to_project_(user: Users, project_id: uuid.UUID, db: Session) -> None:
-    user_project = UserProject(project_id=project_id, user_id=user.id, is_admin=False)
+def add_user_to_project_(user_id: uuid.UUID, project_id: uuid.UUID, db: Session) -> None:
+    user_project = UserProject(project_id=project_id, user_id=user_id, is_admin=False)
     db.add(user_project)
     db.commit()
+    membership_cache.invalidate(user_id, project_id)
+
+
+type InviteStatus = Literal["added", "already_member", "not_found"]
+
+
+def add_users_to_project_(user_emails: list[str], project_id: uuid.UUID, db: Session) -> dict[str, InviteStatus]:
+    statuses: dict[str, InviteStatus] = {email: "not_found" for email in user_emails}
+    query = (
+        select(Users.id, Users.email, UserProject.user_id)
+        .outerjoin(UserProject, and_(UserProject.user_id == Users.id, UserProject.project_id == project_id))
+        .where(Users.email.in_(user_emails))
+    )
+    new_member_ids = []
+    for user_id, email, member_id in db.execute(query).all():
+        if member_id is not None:
+            statuses[email] = "already_member"
+        else:
+            statuses[email] = "added"
+            new_member_ids.append(user_id)
+    if new_member_ids:
+        db.execute(
+            insert(UserProject),
+            [{"project_id": project_id, "user_id": user_id, "is_admin": False} for user_id in new_member_ids],
+        )
+        db.commit()
+        for user_id in new_member_ids:
+            membership_cache.invalidate(user_id, project_id)
+    return statuses
+
+
+def create_document_(
+    db: Session, document_id: uuid.UUID, project_id: uuid.UUID, title: str, digest: str, upload_size: int | None
+) -> Documents | None:
+    if upload_size is None:
+        referenced = db.execute(
+            update(Blobs)
+            .where(Blobs.digest == digest)
+            .values(ref_count=Blobs.ref_count + 1)
+            .returning(Blobs.digest)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        if referenced is None:
+            return None
+    else:
+        insert_blob = sqlite_insert if db.get_bind().dialect.name == "sqlite" else postgresql_insert
+        db.execute(
+            insert_blob(Blobs)
+            .values(digest=digest, size=upload_size, ref_count=1)
+            .on_conflict_do_update(index_elements=[Blobs.digest], set_={"ref_count": Blobs.ref_count + 1})
+        )
+    document = Documents(
+        id=document_id, project_id=project_id, title=title, file_path=blob_key(digest), blob_digest=digest
+    )
+    db.add(document)
+    db.flush()
+    return document
+
+
+def find_accessible_blobs_(db: Session, user_id: uuid.UUID, digests: list[str]) -> dict[str, int]:
+    query = (
+        select(Blobs.digest, Blobs.size)
+        .join(Documents, Documents.blob_digest == Blobs.digest)
+        .join(UserProject, UserProject.project_id == Documents.project_id)
+        .where(UserProject.user_id == user_id, Blobs.digest.in_(digests))
+        .distinct()
+    )
+    return {digest: size for digest, size in db.execute(query).all()}
+
+
+def delete_unreferenced_blobs_(db: Session) -> list[str]:
+    return list(db.execute(delete(Blobs).where(Blobs.ref_count <= 0).returning(Blobs.digest)).scalars().all())
+
+
+async def collect_blob_garbage(file_paths: Sequence[str] = ()) -> None:
+    for file_path in file_paths:
+        await document_storage.delete(file_path)
+    async with open_session() as db:
+        digests = await run_db(db, delete_unreferenced_blobs_)
+        for digest in digests:
+            await blob_store.delete(digest)
+        await run_db(db, lambda session: session.commit())
+
+
+def get_document_(db: Session, project_id: uuid.UUID, document_id: uuid.UUID, user_id: uuid.UUID) -> Documents | None:
+    query = (
+        select(Documents)
+        .join(UserProject, UserProject.project_id == Documents.project_id)
+        .where(Documents.id == document_id, Documents.project_id == project_id, UserProject.user_id == user_id)
+    )
+    return db.execute(query).scalar_one_or_none()
+
+
+def warm_up_queries_(db: Session) -> None:
+    nil_id = uuid.UUID(int=0)
+    get_user("", db)
+    get_user_projects(db, nil_id, limit=1, after=nil_id)
+    get_user_projects(db, nil_id, limit=1)
+    load_project_details_(db, nil_id)
+    load_accessible_project_details_(db, nil_id, nil_id)
+    resolve_project_access(db, nil_id, nil_id)
+    membership_cache.invalidate(nil_id, nil_id)
+    db.rollback()
+
+
+async def warm_up(connections: int) -> None:
+    database = get_database()
+    for target in (database, database.replica):
+        if target is None:
+            continue
+        await target.open_connections(min(connections, settings.postgres_pool_size))
+        async with _database_session(target, target is database.replica) as db:
+            await run_db(db, warm_up_queries_)
@@ -0,0 +1,122 @@
+import functools
+import os
+from dataclasses import dataclass
+from datetime import timedelta
+
+from dotenv import load_dotenv
+
+
+def _env_bool(name: str, default: str = "false") -> bool:
+    return os.environ.get(name, default).lower() == "true"
+
+
+@dataclass
+class Settings:
+    postgres_user: str = ""
+    postgres_password: str = ""
+    postgres_db: str = ""
+    postgres_port: str = "5432"
+    postgres_server: str = "localhost"
+    postgres_replica_server: str = ""
+    read_your_writes_seconds: float = 5
+    read_your_writes_cache_size: int = 100000
+    database_async: bool = False
+    postgres_pool_size: int = 5
+    postgres_max_overflow: int = 10
+    postgres_pool_timeout: float = 30
+    postgres_pool_recycle: int = -1
+    postgres_pool_pre_ping: bool = False
+    database_warm_up_connections: int = 0
+    export_batch_size: int = 1000
+    membership_cache_size: int = 100000
+    membership_cache_ttl: float = 60
+    project_cache_size: int = 10000
+    project_cache_ttl: float = 300
+    project_batch_max_size: int = 5000
+    invite_batch_max_size: int = 1000
+    document_storage_path: str = "documents"
+    document_max_size: int = 1024**3
+    cleanup_workers: int = 2
+    cleanup_shutdown_timeout: float = 30
+    oauth_secret_key: str = ""
+    token_cache_size: int = 10000
+    access_token_expire_minutes: int = 30
+    refresh_token_expire_days: int = 30
+    password_hash_cost: int = 14
+    password_hash_workers: int = os.cpu_count() or 1
+    query_stats_headers: bool = False
+    internal_api_key: str = ""
+    rate_limit_per_second: float = 50
+    rate_limit_burst: float = 100
+    rate_limit_buckets: int = 100000
+    max_in_flight_requests: int = 0
+    max_pool_waiters: int = 0
+    overload_retry_after: int = 1
+    request_timeout: float = 30
+    max_request_timeout: float = 300
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        load_dotenv()
+        env = os.environ.get
+        return cls(
+            postgres_user=env("POSTGRES_USER", ""),
+            postgres_password=env("POSTGRES_PASSWORD", ""),
+            postgres_db=env("POSTGRES_DB", ""),
+            postgres_port=env("POSTGRES_PORT", "5432"),
+            postgres_server=env("POSTGRES_SERVER", "localhost"),
+            postgres_replica_server=env("POSTGRES_REPLICA_SERVER", ""),
+            read_your_writes_seconds=float(env("READ_YOUR_WRITES_SECONDS", "5")),
+            read_your_writes_cache_size=int(env("READ_YOUR_WRITES_CACHE_SIZE", "100000")),
+            database_async=_env_bool("DATABASE_ASYNC"),
+            postgres_pool_size=int(env("POSTGRES_POOL_SIZE", "5")),
+            postgres_max_overflow=int(env("POSTGRES_MAX_OVERFLOW", "10")),
+            postgres_pool_timeout=float(env("POSTGRES_POOL_TIMEOUT", "30")),
+            postgres_pool_recycle=int(env("POSTGRES_POOL_RECYCLE", "-1")),
+            postgres_pool_pre_ping=_env_bool("POSTGRES_POOL_PRE_PING"),
+            database_warm_up_connections=int(env("DATABASE_WARM_UP_CONNECTIONS", "0")),
+            export_batch_size=int(env("EXPORT_BATCH_SIZE", "1000")),
+            membership_cache_size=int(env("MEMBERSHIP_CACHE_SIZE", "100000")),
+            membership_cache_ttl=float(env("MEMBERSHIP_CACHE_TTL", "60")),
+            project_cache_size=int(env("PROJECT_CACHE_SIZE", "10000")),
+            project_cache_ttl=float(env("PROJECT_CACHE_TTL", "300")),
+            project_batch_max_size=int(env("PROJECT_BATCH_MAX_SIZE", "5000")),
+            invite_batch_max_size=int(env("INVITE_BATCH_MAX_SIZE", "1000")),
+            document_storage_path=env("DOCUMENT_STORAGE_PATH", "documents"),
+            document_max_size=int(env("DOCUMENT_MAX_SIZE", str(1024**3))),
+            cleanup_workers=int(env("CLEANUP_WORKERS", "2")),
+            cleanup_shutdown_timeout=float(env("CLEANUP_SHUTDOWN_TIMEOUT", "30")),
+            oauth_secret_key=env("OAUTH_SECRET_KEY", ""),
+            token_cache_size=int(env("TOKEN_CACHE_SIZE", "10000")),
+            access_token_expire_minutes=int(env("ACCESS_TOKEN_EXPIRE_MINUTES", "30")),
+            refresh_token_expire_days=int(env("REFRESH_TOKEN_EXPIRE_DAYS", "30")),
+            password_hash_cost=int(env("PASSWORD_HASH_COST", "14")),
+            password_hash_workers=int(env("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1))),
+            query_stats_headers=_env_bool("QUERY_STATS_HEADERS"),
+            internal_api_key=env("INTERNAL_API_KEY", ""),
+            rate_limit_per_second=float(env("RATE_LIMIT_PER_SECOND", "50")),
+            rate_limit_burst=float(env("RATE_LIMIT_BURST", "100")),
+            rate_limit_buckets=int(env("RATE_LIMIT_BUCKETS", "100000")),
+            max_in_flight_requests=int(env("MAX_IN_FLIGHT_REQUESTS", "0")),
+            max_pool_waiters=int(env("MAX_POOL_WAITERS", "0")),
+            overload_retry_after=int(env("OVERLOAD_RETRY_AFTER", "1")),
+            request_timeout=float(env("REQUEST_TIMEOUT", "30")),
+            max_request_timeout=float(env("MAX_REQUEST_TIMEOUT", "300")),
+        )
+
+    def database_url(self, driver: str = "postgresql") -> str:
+        credentials = f"{self.postgres_user}:{self.postgres_password}"
+        return f"{driver}://{credentials}@{self.postgres_server}:{self.postgres_port}/{self.postgres_db}"
+
+    @property
+    def access_token_expire(self) -> timedelta:
+        return timedelta(minutes=self.access_token_expire_minutes)
+
+    @property
+    def refresh_token_expire(self) -> timedelta:
+        return timedelta(days=self.refresh_token_expire_days)
+
+
+@functools.cache
+def get_settings() -> Settings:
+    return Settings.from_env()
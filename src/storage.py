@@ -0,0 +1,131 @@
+import hashlib
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Protocol
+
+import anyio
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_size: int) -> None:
+        super().__init__(f"Upload exceeds {max_size} bytes")
+        self.max_size = max_size
+
+
+@dataclass(frozen=True, slots=True)
+class StoredFile:
+    size: int
+    etag: str
+
+
+class Storage(Protocol):
+    async def write(self, key: str, chunks: AsyncIterable[bytes], max_size: int | None = None) -> int: ...
+
+    def read(self, key: str, start: int, length: int) -> AsyncIterator[bytes]: ...
+
+    async def stat(self, key: str) -> StoredFile: ...
+
+    async def delete(self, key: str) -> None: ...
+
+    async def exists(self, key: str) -> bool: ...
+
+    async def move(self, source: str, destination: str) -> None: ...
+
+    def local_path(self, key: str) -> Path | None: ...
+
+
+class LocalStorage:
+    chunk_size = 64 * 1024
+
+    def __init__(self, root: Path) -> None:
+        self.root = root.resolve()
+
+    def local_path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    async def write(self, key: str, chunks: AsyncIterable[bytes], max_size: int | None = None) -> int:
+        path = anyio.Path(self.local_path(key))
+        await path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(path.name + ".part")
+        size = 0
+        try:
+            async with await anyio.open_file(partial, "wb") as file:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise UploadTooLarge(max_size)
+                    await file.write(chunk)
+            await partial.rename(path)
+        except BaseException:
+            await partial.unlink(missing_ok=True)
+            raise
+        return size
+
+    async def read(self, key: str, start: int, length: int) -> AsyncIterator[bytes]:
+        async with await anyio.open_file(self.local_path(key), "rb") as file:
+            await file.seek(start)
+            while length > 0:
+                chunk = await file.read(min(self.chunk_size, length))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
+
+    async def stat(self, key: str) -> StoredFile:
+        stat_result = await anyio.Path(self.local_path(key)).stat()
+        etag_base = f"{key}-{stat_result.st_mtime_ns}-{stat_result.st_size}"
+        return StoredFile(
+            size=stat_result.st_size, etag=f'"{hashlib.md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"'
+        )
+
+    async def delete(self, key: str) -> None:
+        await anyio.Path(self.local_path(key)).unlink(missing_ok=True)
+
+    async def exists(self, key: str) -> bool:
+        return await anyio.Path(self.local_path(key)).exists()
+
+    async def move(self, source: str, destination: str) -> None:
+        path = anyio.Path(self.local_path(destination))
+        await path.parent.mkdir(parents=True, exist_ok=True)
+        await anyio.Path(self.local_path(source)).rename(path)
+
+
+def blob_key(digest: str) -> str:
+    return f"blobs/{digest[:2]}/{digest}"
+
+
+@dataclass(frozen=True, slots=True)
+class StagedBlob:
+    digest: str
+    size: int
+    upload_key: str
+
+
+class BlobStore:
+    def __init__(self, storage: Storage) -> None:
+        self.storage = storage
+
+    async def stage(self, chunks: AsyncIterable[bytes], max_size: int | None = None) -> StagedBlob:
+        hasher = hashlib.sha256()
+
+        async def hashed_chunks() -> AsyncIterator[bytes]:
+            async for chunk in chunks:
+                hasher.update(chunk)
+                yield chunk
+
+        upload_key = f"uploads/{uuid.uuid4()}"
+        size = await self.storage.write(upload_key, hashed_chunks(), max_size)
+        return StagedBlob(hasher.hexdigest(), size, upload_key)
+
+    async def publish(self, staged: StagedBlob) -> None:
+        await self.storage.move(staged.upload_key, blob_key(staged.digest))
+
+    async def discard(self, staged: StagedBlob) -> None:
+        await self.storage.delete(staged.upload_key)
+
+    async def delete(self, digest: str) -> None:
+        await self.storage.delete(blob_key(digest))
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+type Job = tuple[Callable[..., Awaitable[None]], tuple[Any, ...]]
+
+
+class JobQueue:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._queue: asyncio.Queue[Job] | None = None
+        self._workers: list[asyncio.Task[None]] = []
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self, workers: int) -> None:
+        if self._queue is not None:
+            raise RuntimeError(f"Job queue {self.name} is already running")
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._work(self._queue)) for _ in range(workers)]
+
+    def submit(self, fn: Callable[..., Awaitable[None]], *args: Any) -> None:
+        if self._queue is None:
+            raise RuntimeError(f"Job queue {self.name} is not running")
+        self._queue.put_nowait((fn, args))
+        self.submitted += 1
+
+    async def _work(self, queue: asyncio.Queue[Job]) -> None:
+        while True:
+            fn, args = await queue.get()
+            try:
+                await fn(*args)
+            except Exception:
+                self.failed += 1
+                logger.exception("Job %s failed in queue %s", getattr(fn, "__name__", fn), self.name)
+            else:
+                self.completed += 1
+            finally:
+                queue.task_done()
+
+    async def stop(self, timeout: float) -> None:
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except TimeoutError:
+            logger.warning("Job queue %s stopped with %d pending jobs", self.name, self._queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._queue = None
+        self._workers = []
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
@@ -0,0 +1,32 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import httpx
+import pytest
+
+from src.metrics import count_queries
+from src.settings import get_settings
+from tests.query_budget import MaxQueries, QueryBudget
+
+
+@pytest.fixture
+def query_budget(monkeypatch: pytest.MonkeyPatch) -> QueryBudget:
+    monkeypatch.setattr(get_settings(), "query_stats_headers", True)
+
+    def check(response: httpx.Response, limit: int) -> None:
+        queries = int(response.headers["X-DB-Queries"])
+        request = response.request
+        assert queries <= limit, f"{request.method} {request.url.path} ran {queries} queries (max {limit})"
+
+    return check
+
+
+@pytest.fixture
+def max_queries() -> MaxQueries:
+    @contextmanager
+    def budget(limit: int) -> Iterator[list[float]]:
+        with count_queries() as timings:
+            yield timings
+        assert len(timings) <= limit, f"ran {len(timings)} queries (max {limit})"
+
+    return budget
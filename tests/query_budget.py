@@ -0,0 +1,7 @@
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+
+import httpx
+
+type QueryBudget = Callable[[httpx.Response, int], None]
+type MaxQueries = Callable[[int], AbstractContextManager[list[float]]]
@@ -0,0 +1,142 @@
+import asyncio
+import uuid
+
+from src.cache import (
+    CachedProject,
+    InProcessMembershipCache,
+    InProcessProjectDetailsCache,
+    LRUCache,
+    MembershipRole,
+    SingleFlight,
+)
+
+
+class FakeTimer:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    cache: LRUCache[str, int] = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_lru_cache_expires_entries() -> None:
+    timer = FakeTimer()
+    cache: LRUCache[str, int] = LRUCache(maxsize=10, ttl=5, timer=timer)
+    cache.set("default", 1)
+    cache.set("short", 2, ttl=1)
+    timer.now = 2
+
+    assert cache.get("short") is None
+    assert cache.get("default") == 1
+    timer.now = 5
+    assert cache.get("default") is None
+    assert len(cache) == 0
+
+
+def test_lru_cache_stats() -> None:
+    cache: LRUCache[str, int] = LRUCache(maxsize=10)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("missing")
+
+    assert cache.stats() == {"size": 1, "maxsize": 10, "hits": 1, "misses": 1, "evictions": 0, "hit_ratio": 0.5}
+
+
+def test_project_details_cache_rejects_loads_raced_by_invalidation() -> None:
+    cache = InProcessProjectDetailsCache(maxsize=10, ttl=60)
+    project = CachedProject(uuid.uuid4(), "name", None, 1)
+    generation = cache.generation
+    cache.invalidate(project.project_id)
+    cache.set(project, generation)
+    assert cache.get(project.project_id) is None
+
+    cache.set(project, cache.generation)
+    assert cache.get(project.project_id) == project
+    cache.invalidate(project.project_id)
+    assert cache.get(project.project_id) is None
+
+
+def test_membership_cache_rejects_loads_raced_by_invalidation() -> None:
+    cache = InProcessMembershipCache(maxsize=10, ttl=60)
+    user_id, project_id = uuid.uuid4(), uuid.uuid4()
+    generation = cache.generation
+    cache.invalidate(user_id, project_id)
+    cache.set(user_id, project_id, MembershipRole.NONE, generation)
+    assert cache.get(user_id, project_id) is None
+
+    cache.set(user_id, project_id, MembershipRole.MEMBER, cache.generation)
+    assert cache.get(user_id, project_id) is MembershipRole.MEMBER
+    cache.invalidate(user_id, project_id)
+    assert cache.get(user_id, project_id) is None
+
+
+def test_single_flight_shares_concurrent_loads() -> None:
+    flight: SingleFlight[str, int] = SingleFlight()
+    calls = 0
+
+    async def load() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def run() -> list[int]:
+        return await asyncio.gather(*(flight.do("key", load) for _ in range(5)))
+
+    assert asyncio.run(run()) == [1] * 5
+    assert calls == 1
+    assert flight.shared == 4
+    assert asyncio.run(flight.do("key", load)) == 2
+
+
+def test_single_flight_propagates_errors() -> None:
+    flight: SingleFlight[str, int] = SingleFlight()
+
+    async def fail() -> int:
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run() -> list[int | BaseException]:
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(run()))
+
+
+def test_single_flight_followers_retry_when_leader_is_cancelled() -> None:
+    flight: SingleFlight[str, int] = SingleFlight()
+    calls = 0
+
+    async def load() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def run() -> list[int]:
+        leader = asyncio.create_task(flight.do("key", load))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do("key", load)) for _ in range(3)]
+        cancelled_follower = asyncio.create_task(flight.do("key", load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        cancelled_follower.cancel()
+        results = await asyncio.gather(*followers)
+        assert leader.cancelled()
+        assert cancelled_follower.cancelled()
+        return results
+
+    assert asyncio.run(run()) == [2, 2, 2]
+    assert calls == 2
@@ -0,0 +1,53 @@
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+import src.database
+from src.database import Database, get_database
+from src.main import app
+from src.models import Base
+from src.settings import Settings, get_settings
+
+
+def test_settings_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("POSTGRES_USER", "app")
+    monkeypatch.setenv("POSTGRES_SERVER", "db")
+    monkeypatch.setenv("DATABASE_ASYNC", "true")
+    monkeypatch.setenv("ACCESS_TOKEN_EXPIRE_MINUTES", "5")
+    settings = Settings.from_env()
+
+    assert settings.database_async
+    assert settings.database_url("postgresql+asyncpg").startswith("postgresql+asyncpg://app:")
+    assert "@db:5432/" in settings.database_url()
+    assert settings.access_token_expire.total_seconds() == 300
+
+
+def test_database_is_created_lazily(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(src.database, "_database", None)
+    database = get_database()
+
+    assert get_database() is database
+    assert database.pool_stats.snapshot()["connects"] == 0
+
+
+def test_lifespan_warms_up_pool_and_queries(monkeypatch: pytest.MonkeyPatch) -> None:
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    statements: list[str] = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn: Any, cursor: Any, statement: str, *_: Any) -> None:
+        statements.append(statement)
+
+    database = Database.from_engine(engine)
+    monkeypatch.setattr(src.database, "_database", database)
+    monkeypatch.setattr(get_settings(), "database_warm_up_connections", 2)
+    with TestClient(app):
+        assert database.pool_stats.snapshot()["checkouts"] >= 2
+        assert any("FROM users" in statement for statement in statements)
+        assert any("FROM projects JOIN user_project" in statement for statement in statements)
+
+    assert src.database._database is None
@@ -0,0 +1,159 @@
+import time
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src.auth import create_access_token
+from src.database import Database
+from src.deadlines import DeadlineExceeded, _deadline, apply_statement_timeout
+from src.main import app
+from src.metrics import request_metrics
+from src.settings import get_settings
+
+
+@pytest.fixture
+def client(monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    monkeypatch.setattr("src.database._database", MagicMock(async_session_factory=None, replica=None))
+    monkeypatch.setattr(get_settings(), "oauth_secret_key", "test_secret_key")
+    return TestClient(app, raise_server_exceptions=False)
+
+
+@pytest.fixture
+def headers() -> dict[str, str]:
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(get_settings(), "oauth_secret_key", "test_secret_key")
+        token = create_access_token("user", uuid.uuid4(), timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_slow_request_is_cancelled_at_deadline(
+    client: TestClient, headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cancelled = []
+
+    async def slow_query(*args: object) -> None:
+        try:
+            await anyio.sleep(5)
+        except anyio.get_cancelled_exc_class():
+            cancelled.append(True)
+            raise
+
+    monkeypatch.setattr("src.main.run_db", slow_query)
+    timeouts = request_metrics.timeouts[("GET", "/projects")]
+    start = time.monotonic()
+    response = client.get("/projects", headers=headers | {"X-Request-Timeout": "0.05"})
+
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Request deadline exceeded"}
+    assert time.monotonic() - start < 2
+    assert cancelled == [True]
+    assert request_metrics.timeouts[("GET", "/projects")] == timeouts + 1
+    assert 'http_request_timeouts_total{method="GET",route="/projects"}' in client.get("/metrics").text
+
+
+@pytest.mark.parametrize(("pgcode", "status_code"), [("57014", 504), ("08006", 500)])
+def test_statement_timeout_maps_to_gateway_timeout(
+    client: TestClient, headers: dict[str, str], monkeypatch: pytest.MonkeyPatch, pgcode: str, status_code: int
+) -> None:
+    async def failing_query(*args: object) -> None:
+        raise OperationalError("SELECT 1", {}, SimpleNamespace(pgcode=pgcode))
+
+    monkeypatch.setattr("src.main.run_db", failing_query)
+
+    assert client.get("/projects", headers=headers).status_code == status_code
+
+
+@pytest.mark.parametrize("value", ["0", "-1", "soon", "nan", "inf"])
+def test_invalid_timeout_header(client: TestClient, headers: dict[str, str], value: str) -> None:
+    response = client.get("/projects", headers=headers | {"X-Request-Timeout": value})
+
+    assert response.status_code == 400
+
+
+def test_apply_statement_timeout_uses_remaining_budget() -> None:
+    connection = MagicMock()
+    connection.dialect.name = "postgresql"
+    apply_statement_timeout(MagicMock(), MagicMock(), connection)
+    connection.exec_driver_sql.assert_not_called()
+
+    token = _deadline.set(time.monotonic() + 2)
+    try:
+        apply_statement_timeout(MagicMock(), MagicMock(), connection)
+        statement = connection.exec_driver_sql.call_args.args[0]
+        assert statement.startswith("SET LOCAL statement_timeout = ")
+        assert 1000 < int(statement.rsplit(" ", 1)[1]) <= 2000
+    finally:
+        _deadline.reset(token)
+
+    token = _deadline.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            apply_statement_timeout(MagicMock(), MagicMock(), connection)
+    finally:
+        _deadline.reset(token)
+
+
+@pytest.fixture
+def checked_out() -> list[int]:
+    return [0]
+
+
+@pytest.fixture
+def sqlite_client(monkeypatch: pytest.MonkeyPatch, checked_out: list[int]) -> TestClient:
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    event.listen(engine, "checkout", lambda *_: checked_out.__setitem__(0, checked_out[0] + 1))
+    event.listen(engine, "checkin", lambda *_: checked_out.__setitem__(0, checked_out[0] - 1))
+    monkeypatch.setattr("src.database._database", Database.from_engine(engine))
+    monkeypatch.setattr(get_settings(), "oauth_secret_key", "test_secret_key")
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_threadpool_statement_is_interrupted_at_deadline(
+    sqlite_client: TestClient, headers: dict[str, str], monkeypatch: pytest.MonkeyPatch, checked_out: list[int]
+) -> None:
+    finished = []
+
+    def slow_projects(db: Session, *args: object) -> list:
+        numbers = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 1000000000)"
+        db.execute(text(f"{numbers} SELECT max(x) FROM n")).all()
+        finished.append(True)
+        return []
+
+    monkeypatch.setattr("src.main.get_user_projects", slow_projects)
+    start = time.monotonic()
+    response = sqlite_client.get("/projects", headers=headers | {"X-Request-Timeout": "0.2"})
+
+    assert response.status_code == 504
+    assert time.monotonic() - start < 1
+    assert finished == []
+    assert checked_out == [0]
+
+
+def test_threadpool_statement_after_deadline_is_refused(
+    sqlite_client: TestClient, headers: dict[str, str], monkeypatch: pytest.MonkeyPatch, checked_out: list[int]
+) -> None:
+    executed = []
+
+    def late_projects(db: Session, *args: object) -> list:
+        db.execute(text("SELECT 1"))
+        executed.append("first")
+        time.sleep(0.3)
+        db.execute(text("SELECT 2"))
+        executed.append("second")
+        return []
+
+    monkeypatch.setattr("src.main.get_user_projects", late_projects)
+    response = sqlite_client.get("/projects", headers=headers | {"X-Request-Timeout": "0.1"})
+
+    assert response.status_code == 504
+    assert executed == ["first"]
+    assert checked_out == [0]
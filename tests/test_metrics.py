@@ -0,0 +1,56 @@
+import asyncio
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from src.main import app
+from src.metrics import PROMETHEUS_CONTENT_TYPE, RequestMetrics, _db_timings, track_db_time
+
+
+def test_metrics_endpoint_reports_templated_routes() -> None:
+    client = TestClient(app)
+    project_id = uuid.uuid4()
+    client.get(f"/project/{project_id}/info")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == PROMETHEUS_CONTENT_TYPE
+    assert 'http_requests_total{method="GET",route="/project/{project_id}/info",status="4xx"}' in response.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/project/{project_id}/info",le="+Inf"}' in (
+        response.text
+    )
+    assert 'route="/project/' + '"' not in response.text
+
+
+def test_render_prometheus_histograms() -> None:
+    metrics = RequestMetrics()
+    route = metrics.route("GET", "/projects")
+    route.latency.observe(0.02)
+    route.db_time.observe(0.004)
+    route.statuses["2xx"] += 1
+    rendered = metrics.render_prometheus()
+
+    assert 'http_requests_total{method="GET",route="/projects",status="2xx"} 1' in rendered
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/projects",le="0.01"} 0' in rendered
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/projects",le="0.025"} 1' in rendered
+    assert 'http_request_db_duration_seconds_count{method="GET",route="/projects"} 1' in rendered
+    assert 'http_requests_in_flight{method="GET",route="/projects"} 0' in rendered
+
+
+def test_track_db_time_records_queries_in_current_context() -> None:
+    engine = create_engine("sqlite://")
+    track_db_time(engine)
+
+    def query() -> None:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    async def run_queries() -> list[float]:
+        timings: list[float] = []
+        _db_timings.set(timings)
+        await asyncio.to_thread(query)
+        return timings
+
+    assert len(asyncio.run(run_queries())) == 1
+    query()
@@ -0,0 +1,46 @@
+import asyncio
+import hashlib
+
+from src.passwords import (
+    hash_password,
+    hash_password_async,
+    verify_password,
+    verify_password_async,
+)
+from src.settings import get_settings
+
+
+def test_hash_password_round_trip() -> None:
+    hashed = hash_password("secret")
+
+    assert hashed.startswith(f"scrypt$ln={get_settings().password_hash_cost},")
+    assert hashed != hash_password("secret")
+    assert verify_password("secret", hashed) == (True, False)
+    assert verify_password("wrong", hashed) == (False, False)
+
+
+def test_verify_password_flags_outdated_cost() -> None:
+    hashed = hash_password("secret", cost=4)
+
+    assert verify_password("secret", hashed) == (True, True)
+
+
+def test_verify_password_upgrades_legacy_sha256() -> None:
+    legacy = hashlib.sha256(b"secret").hexdigest()
+
+    assert verify_password("secret", legacy) == (True, True)
+    assert verify_password("wrong", legacy) == (False, True)
+
+
+def test_verify_password_rejects_malformed_hash() -> None:
+    assert verify_password("secret", "not-a-hash") == (False, False)
+    assert verify_password("secret", "bcrypt$ln=4,r=8,p=1$c2FsdA$a2V5") == (False, False)
+    assert verify_password("secret", "scrypt$ln=4,r=8,p=1$c$a2V5") == (False, False)
+    assert verify_password("secret", "scrypt$ln=4,r=8,p=1$c2FsdA$a") == (False, False)
+
+
+def test_password_hashing_runs_off_the_event_loop() -> None:
+    async def round_trip() -> tuple[bool, bool]:
+        return await verify_password_async("secret", await hash_password_async("secret"))
+
+    assert asyncio.run(round_trip()) == (True, False)
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+from src.pool_stats import InstrumentedQueuePool, instrument_engine
+
+
+def test_pool_stats_counts_checkouts_and_idle() -> None:
+    engine = create_engine("sqlite://", poolclass=InstrumentedQueuePool, pool_size=2, max_overflow=0)
+    stats = instrument_engine(engine)
+    with engine.connect():
+        snapshot = stats.snapshot()
+        assert snapshot["checked_out"] == 1
+        assert snapshot["checkouts"] == 1
+    snapshot = stats.snapshot()
+
+    assert snapshot["checked_out"] == 0
+    assert snapshot["idle"] == 1
+    assert snapshot["checkins"] == 1
+    assert snapshot["connects"] == 1
+    assert snapshot["wait_time_ms"]["count"] == 1
+
+
+def test_pool_stats_records_checkout_timeouts() -> None:
+    engine = create_engine("sqlite://", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05)
+    stats = instrument_engine(engine)
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        snapshot = stats.snapshot()
+
+    assert snapshot["timeouts"] == 1
+    assert snapshot["waiting"] == 0
+    assert snapshot["wait_time_ms"]["count"] == 2
+    assert snapshot["wait_time_ms"]["buckets"]["1.0"] == 1
+
+
+def test_pool_stats_survive_dispose() -> None:
+    engine = create_engine("sqlite://", poolclass=InstrumentedQueuePool)
+    stats = instrument_engine(engine)
+    engine.dispose()
+    with engine.connect():
+        pass
+
+    assert stats.snapshot()["wait_time_ms"]["count"] == 1
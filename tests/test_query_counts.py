@@ -0,0 +1,263 @@
+import hashlib
+import uuid
+from collections.abc import AsyncIterable, Generator
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine, create_engine, select
+from sqlalchemy.orm import Session
+
+from src.auth import create_access_token
+from src.cache import InProcessMembershipCache, InProcessProjectDetailsCache
+from src.database import Database
+from src.main import app
+from src.models import Base, Blobs, Documents, Projects, UserProject, Users
+from src.service import collect_blob_garbage, create_document_, get_user_projects
+from src.settings import get_settings
+from src.storage import BlobStore, LocalStorage, StagedBlob, blob_key
+from tests.query_budget import MaxQueries, QueryBudget
+
+
+@pytest.fixture
+def engine(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Generator[Engine]:
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr("src.database._database", Database.from_engine(engine))
+    monkeypatch.setattr("src.service.membership_cache", InProcessMembershipCache(100, 60))
+    monkeypatch.setattr("src.service.project_details_cache", InProcessProjectDetailsCache(100, 60))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def seeded(engine: Engine) -> dict[str, uuid.UUID]:
+    ids = {"owner": uuid.uuid4(), "invitee": uuid.uuid4(), "project": uuid.uuid4()}
+    with Session(engine) as db:
+        db.add_all(
+            [
+                Users(id=ids["owner"], name="owner", email="owner@example.com", hashed_password="-"),
+                Users(id=ids["invitee"], name="invitee", email="invitee@example.com", hashed_password="-"),
+                Projects(id=ids["project"], name="project", description="description"),
+            ]
+        )
+        db.flush()
+        db.add(UserProject(project_id=ids["project"], user_id=ids["owner"], is_admin=True))
+        db.commit()
+    return ids
+
+
+@pytest.fixture
+def headers(seeded: dict[str, uuid.UUID]) -> dict[str, str]:
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(get_settings(), "oauth_secret_key", "test_secret_key")
+        token = create_access_token("owner", seeded["owner"], timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def client(monkeypatch: pytest.MonkeyPatch) -> Generator[TestClient]:
+    monkeypatch.setattr(get_settings(), "oauth_secret_key", "test_secret_key")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_project_endpoints_query_budget(
+    client: TestClient, seeded: dict[str, uuid.UUID], headers: dict[str, str], query_budget: QueryBudget
+) -> None:
+    project_url = f"/project/{seeded['project']}"
+    body = {"name": "renamed", "description": "updated"}
+
+    listing = client.get("/projects", headers=headers)
+    query_budget(listing, 1)
+    query_budget(client.get("/projects", headers=headers | {"If-None-Match": listing.headers["ETag"]}), 1)
+    query_budget(client.post("/projects", json=body, headers=headers), 2)
+    query_budget(client.get(f"{project_url}/info", headers=headers), 1)
+    query_budget(client.get(f"{project_url}/info", headers=headers), 0)
+    query_budget(client.put(f"{project_url}/info", json=body, headers=headers), 1)
+    query_budget(client.patch(f"{project_url}/info", json={"description": None}, headers=headers), 1)
+    query_budget(client.post(f"{project_url}/invite?user_email=invitee@example.com", headers=headers), 2)
+    query_budget(client.delete(project_url, headers=headers), 4)
+
+
+def test_cached_membership_skips_access_query(
+    client: TestClient, seeded: dict[str, uuid.UUID], headers: dict[str, str], query_budget: QueryBudget
+) -> None:
+    check_url = f"/project/{seeded['project']}/documents/check"
+
+    query_budget(client.post(check_url, json=["a" * 64], headers=headers), 2)
+    query_budget(client.post(check_url, json=["a" * 64], headers=headers), 1)
+    query_budget(client.delete(f"/project/{seeded['project']}", headers=headers), 4)
+
+
+def test_invite_with_cold_membership_cache(
+    client: TestClient, seeded: dict[str, uuid.UUID], headers: dict[str, str], query_budget: QueryBudget
+) -> None:
+    invite_url = f"/project/{seeded['project']}/invite?user_email=invitee@example.com"
+
+    query_budget(client.post(invite_url, headers=headers), 2)
+    repeated = client.post(invite_url, headers=headers)
+    assert repeated.status_code == 400
+    query_budget(repeated, 1)
+
+
+def test_project_etags(client: TestClient, seeded: dict[str, uuid.UUID], headers: dict[str, str]) -> None:
+    project_url = f"/project/{seeded['project']}/info"
+    info = client.get(project_url, headers=headers)
+    listing = client.get("/projects", headers=headers)
+
+    assert client.get(project_url, headers=headers | {"If-None-Match": info.headers["ETag"]}).status_code == 304
+    assert client.get("/projects", headers=headers | {"If-None-Match": listing.headers["ETag"]}).status_code == 304
+
+    body = {"name": "renamed", "description": "updated"}
+    updated = client.put(project_url, json=body, headers=headers | {"If-Match": info.headers["ETag"]})
+    assert updated.status_code == 200
+    assert updated.headers["ETag"] != info.headers["ETag"]
+    stale = client.put(project_url, json=body, headers=headers | {"If-Match": info.headers["ETag"]})
+    assert stale.status_code == 412
+
+    refetched = client.get(project_url, headers=headers | {"If-None-Match": info.headers["ETag"]})
+    assert refetched.status_code == 200
+    assert refetched.json()["name"] == "renamed"
+    assert client.get("/projects", headers=headers | {"If-None-Match": listing.headers["ETag"]}).status_code == 200
+
+    client.post("/projects", json=body, headers=headers)
+    refreshed = client.get("/projects", headers=headers)
+    assert len(refreshed.json()) == 2
+    assert refreshed.headers["ETag"] != listing.headers["ETag"]
+
+
+def test_project_list_etag_tracks_membership(
+    client: TestClient, seeded: dict[str, uuid.UUID], headers: dict[str, str]
+) -> None:
+    token = create_access_token("invitee", seeded["invitee"], timedelta(minutes=5))
+    invitee_headers = {"Authorization": f"Bearer {token}"}
+    before = client.get("/projects", headers=invitee_headers)
+    assert before.json() == []
+
+    invite_url = f"/project/{seeded['project']}/invite?user_email=invitee@example.com"
+    assert client.post(invite_url, headers=headers).status_code == 201
+    after = client.get("/projects", headers=invitee_headers | {"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert [project["project_id"] for project in after.json()] == [str(seeded["project"])]
+
+
+def test_patch_project_updates_only_given_fields(
+    client: TestClient, seeded: dict[str, uuid.UUID], headers: dict[str, str]
+) -> None:
+    project_url = f"/project/{seeded['project']}/info"
+    etag = client.get(project_url, headers=headers).headers["ETag"]
+
+    patched = client.patch(project_url, json={"description": ""}, headers=headers | {"If-Match": etag})
+    assert patched.status_code == 200
+    assert patched.json() == {"project_id": str(seeded["project"]), "name": "project", "description": ""}
+    assert patched.headers["ETag"] != etag
+    assert client.patch(project_url, json={}, headers=headers).headers["ETag"] == patched.headers["ETag"]
+    assert client.patch(project_url, json={"name": None}, headers=headers).status_code == 422
+
+    stale = client.patch(project_url, json={"name": "stale"}, headers=headers | {"If-Match": etag})
+    assert stale.status_code == 412
+    replaced = client.put(project_url, json={"name": "replaced"}, headers=headers | {"If-Match": "*"})
+    assert replaced.status_code == 200
+    assert client.get(project_url, headers=headers).json() == {
+        "project_id": str(seeded["project"]),
+        "name": "replaced",
+        "description": "",
+    }
+
+
+def test_update_project_requires_membership(client: TestClient, seeded: dict[str, uuid.UUID]) -> None:
+    token = create_access_token("invitee", seeded["invitee"], timedelta(minutes=5))
+    response = client.patch(
+        f"/project/{seeded['project']}/info", json={"name": "hijacked"}, headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 404
+
+
+def test_get_user_projects_query_budget(engine: Engine, seeded: dict[str, uuid.UUID], max_queries: MaxQueries) -> None:
+    with Session(engine) as db, max_queries(1):
+        assert len(get_user_projects(db, seeded["owner"])) == 1
+
+
+def test_delete_project_removes_documents_in_background(
+    engine: Engine,
+    seeded: dict[str, uuid.UUID],
+    headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    storage = LocalStorage(tmp_path)
+    monkeypatch.setattr("src.service.document_storage", storage)
+    monkeypatch.setattr("src.service.blob_store", BlobStore(storage))
+    shared, owned = "a" * 64, "b" * 64
+    other_project = uuid.uuid4()
+    with Session(engine) as db:
+        db.add_all([Blobs(digest=shared, size=1, ref_count=2), Blobs(digest=owned, size=1, ref_count=2)])
+        db.add(Projects(id=other_project, name="other", description="other"))
+        db.flush()
+        db.add_all(
+            [
+                Documents(project_id=seeded["project"], title="a", file_path=blob_key(shared), blob_digest=shared),
+                Documents(project_id=other_project, title="a", file_path=blob_key(shared), blob_digest=shared),
+                Documents(project_id=seeded["project"], title="b", file_path=blob_key(owned), blob_digest=owned),
+                Documents(project_id=seeded["project"], title="b2", file_path=blob_key(owned), blob_digest=owned),
+                Documents(project_id=seeded["project"], title="legacy", file_path="legacy/document"),
+            ]
+        )
+        db.commit()
+    for key in (blob_key(shared), blob_key(owned), "legacy/document"):
+        storage.local_path(key).parent.mkdir(parents=True, exist_ok=True)
+        storage.local_path(key).write_bytes(b"content")
+
+    monkeypatch.setattr(get_settings(), "oauth_secret_key", "test_secret_key")
+    with TestClient(app) as client:
+        assert client.delete(f"/project/{seeded['project']}", headers=headers).status_code == 204
+        with Session(engine) as db:
+            assert db.get(Projects, seeded["project"]) is None
+            assert db.scalars(select(Documents.project_id)).all() == [other_project]
+            assert db.scalars(select(Blobs.ref_count).where(Blobs.digest == shared)).one() == 1
+
+    assert storage.local_path(blob_key(shared)).exists()
+    assert not storage.local_path(blob_key(owned)).exists()
+    assert not storage.local_path("legacy/document").exists()
+
+
+def test_upload_survives_concurrent_blob_collection(
+    client: TestClient,
+    engine: Engine,
+    seeded: dict[str, uuid.UUID],
+    headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    storage = LocalStorage(tmp_path)
+    blob_store = BlobStore(storage)
+    for module in ("src.main", "src.service"):
+        monkeypatch.setattr(f"{module}.document_storage", storage)
+        monkeypatch.setattr(f"{module}.blob_store", blob_store)
+    content = b"recycled content"
+    digest = hashlib.sha256(content).hexdigest()
+    with Session(engine) as db:
+        db.add(Blobs(digest=digest, size=len(content), ref_count=0))
+        db.commit()
+    storage.local_path(blob_key(digest)).parent.mkdir(parents=True)
+    storage.local_path(blob_key(digest)).write_bytes(content)
+
+    stage = blob_store.stage
+
+    async def stage_then_collect(chunks: AsyncIterable[bytes], max_size: int | None = None) -> StagedBlob:
+        staged = await stage(chunks, max_size)
+        await collect_blob_garbage()
+        return staged
+
+    monkeypatch.setattr(blob_store, "stage", stage_then_collect)
+    project_url = f"/project/{seeded['project']}/documents"
+
+    upload = client.post(project_url, params={"title": "document"}, content=content, headers=headers)
+    assert upload.status_code == 201
+    assert client.get(upload.json()["file_path"], headers=headers).content == content
+    with Session(engine) as db:
+        assert db.scalars(select(Blobs.ref_count).where(Blobs.digest == digest)).one() == 1
+        assert create_document_(db, uuid.uuid4(), seeded["project"], "copy", "f" * 64, None) is None
@@ -0,0 +1,145 @@
+import asyncio
+import uuid
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.types import Message, Receive, Scope, Send
+
+from src.auth import create_access_token
+from src.main import app
+from src.ratelimit import AdmissionController, AdmissionMiddleware, InProcessRateLimitBackend
+from src.settings import get_settings
+
+
+class FakeTimer:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_refills_over_time() -> None:
+    timer = FakeTimer()
+    backend = InProcessRateLimitBackend(10, timer)
+
+    def acquire(cost: float = 1) -> float:
+        return asyncio.run(backend.acquire("user", cost, rate=1, burst=2))
+
+    assert [acquire(), acquire(), acquire()] == [0.0, 0.0, 1.0]
+    timer.now = 0.5
+    assert acquire() == 0.5
+    timer.now = 2.0
+    assert acquire(cost=5) == 0.0
+    assert asyncio.run(backend.acquire("other", 1, rate=1, burst=2)) == 0.0
+
+
+@pytest.fixture
+def admission(monkeypatch: pytest.MonkeyPatch) -> AdmissionController:
+    controller = AdmissionController(InProcessRateLimitBackend(10))
+    monkeypatch.setattr("src.ratelimit.admission", controller)
+    monkeypatch.setattr(get_settings(), "oauth_secret_key", "test_secret_key")
+    monkeypatch.setattr(get_settings(), "internal_api_key", "internal_key")
+    return controller
+
+
+@pytest.fixture
+def headers() -> dict[str, str]:
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(get_settings(), "oauth_secret_key", "test_secret_key")
+        token = create_access_token("user", uuid.uuid4(), timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}", "X-Internal-Key": "internal_key"}
+
+
+def test_rate_limit_per_user_with_route_costs(
+    admission: AdmissionController, headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(get_settings(), "rate_limit_per_second", 0.1)
+    monkeypatch.setattr(get_settings(), "rate_limit_burst", 10)
+    client = TestClient(app)
+
+    assert client.get("/internal/cache-stats", headers=headers).status_code == 200
+    limited = client.post("/projects/batch", json=[], headers=headers)
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "10"
+    assert client.get("/internal/cache-stats", headers=headers).status_code == 200
+
+    metrics = client.get("/metrics").text
+    assert 'http_requests_rejected_total{method="POST",route="/projects/batch",reason="rate_limited"}' in metrics
+
+
+def test_overload_sheds_requests(
+    admission: AdmissionController, headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(get_settings(), "max_in_flight_requests", 1)
+    client = TestClient(app)
+
+    assert client.get("/internal/cache-stats", headers=headers).status_code == 200
+    admission.in_flight = 1
+    shed = client.get("/internal/cache-stats", headers=headers)
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "1"
+    assert client.post("/token", data={"username": "user", "password": "password"}).status_code == 503
+    assert client.get("/metrics").status_code == 200
+
+
+def test_pool_waiters_shed_requests(
+    admission: AdmissionController, headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    database = MagicMock(async_pool_stats=None, replica=None)
+    database.pool_stats.waiting = 3
+    monkeypatch.setattr("src.database._database", database)
+    monkeypatch.setattr(get_settings(), "max_pool_waiters", 3)
+
+    response = TestClient(app).get("/internal/cache-stats", headers=headers)
+
+    assert response.status_code == 503
+    assert 'reason="pool_waiters"' in TestClient(app).get("/metrics").text
+
+
+def test_replica_pool_waiters_shed_requests(
+    admission: AdmissionController, headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    replica = MagicMock(replica=None)
+    replica.pool_stats.waiting = 1
+    replica.async_pool_stats.waiting = 1
+    database = MagicMock(async_pool_stats=None, replica=replica)
+    database.pool_stats.waiting = 1
+    monkeypatch.setattr("src.database._database", database)
+    monkeypatch.setattr(get_settings(), "max_pool_waiters", 3)
+
+    assert TestClient(app).get("/internal/cache-stats", headers=headers).status_code == 503
+    replica.async_pool_stats.waiting = 0
+    assert TestClient(app).get("/internal/cache-stats", headers=headers).status_code == 200
+
+
+def test_in_flight_covers_streamed_body(admission: AdmissionController) -> None:
+    in_flight: list[tuple[str, int]] = []
+
+    async def streaming_app(scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for chunk in (b"first", b"second"):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        in_flight.append((message["type"], admission.in_flight))
+
+    scope = {
+        "type": "http",
+        "app": app,
+        "method": "GET",
+        "path": "/projects/export",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+    }
+    asyncio.run(AdmissionMiddleware(streaming_app)(scope, receive, send))
+
+    assert in_flight == [("http.response.start", 1)] + [("http.response.body", 1)] * 3
+    assert admission.in_flight == 0
@@ -0,0 +1,79 @@
+import uuid
+from collections.abc import Generator
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session
+
+from src.models import Base, RefreshTokens, Users
+from src.service import issue_refresh_token_, revoke_refresh_token_, rotate_refresh_token_
+
+
+@pytest.fixture
+def db() -> Generator[Session]:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def user(db: Session) -> Users:
+    user = Users(id=uuid.uuid4(), name="test_user", email="test@example.com", hashed_password="hashed")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_rotate_refresh_token_issues_new_token_in_same_family(db: Session, user: Users) -> None:
+    refresh_token = issue_refresh_token_(db, user.id)
+    rotated = rotate_refresh_token_(db, refresh_token)
+
+    assert rotated is not None
+    assert (rotated.user_id, rotated.user_name) == (user.id, user.name)
+    assert rotated.refresh_token != refresh_token
+    assert len(set(db.scalars(select(RefreshTokens.family_id)))) == 1
+    assert rotate_refresh_token_(db, rotated.refresh_token) is not None
+
+
+def test_reused_refresh_token_revokes_family(db: Session, user: Users) -> None:
+    other_session = issue_refresh_token_(db, user.id)
+    refresh_token = issue_refresh_token_(db, user.id)
+    rotated = rotate_refresh_token_(db, refresh_token)
+    assert rotated is not None
+
+    assert rotate_refresh_token_(db, refresh_token) is None
+    assert rotate_refresh_token_(db, rotated.refresh_token) is None
+    assert rotate_refresh_token_(db, other_session) is not None
+
+
+def test_expired_refresh_token_is_rejected(db: Session, user: Users) -> None:
+    refresh_token = issue_refresh_token_(db, user.id)
+    db.execute(update(RefreshTokens).values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    db.commit()
+
+    assert rotate_refresh_token_(db, refresh_token) is None
+
+
+def test_revoke_refresh_token(db: Session, user: Users) -> None:
+    refresh_token = issue_refresh_token_(db, user.id)
+    revoke_refresh_token_(db, refresh_token)
+
+    assert rotate_refresh_token_(db, refresh_token) is None
+    assert db.scalars(select(RefreshTokens)).all() == []
+
+
+def test_issuing_refresh_tokens_prunes_expired_rows(db: Session, user: Users) -> None:
+    abandoned = issue_refresh_token_(db, user.id)
+    rotated = rotate_refresh_token_(db, issue_refresh_token_(db, user.id))
+    assert rotated is not None
+    db.execute(update(RefreshTokens).values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    db.commit()
+
+    refresh_token = issue_refresh_token_(db, user.id)
+    assert rotate_refresh_token_(db, abandoned) is None
+    again = rotate_refresh_token_(db, refresh_token)
+
+    assert again is not None
+    assert len(db.scalars(select(RefreshTokens.token_hash)).all()) == 2
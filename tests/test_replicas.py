@@ -0,0 +1,152 @@
+import dataclasses
+import uuid
+from collections.abc import Generator
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src.auth import create_access_token
+from src.cache import InProcessMembershipCache, InProcessProjectDetailsCache
+from src.database import READ_YOUR_WRITES_COOKIE, Database, ReadRouter, ReadTarget
+from src.main import app
+from src.metrics import request_metrics
+from src.models import Base, Projects, UserProject, Users
+from src.settings import get_settings
+from tests.query_budget import QueryBudget
+
+
+def _sqlite_engine() -> Engine:
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def _add_project(engine: Engine, user_id: uuid.UUID, project_id: uuid.UUID) -> None:
+    with Session(engine) as db:
+        db.add(Projects(id=project_id, name=f"project {project_id}", description="description"))
+        db.flush()
+        db.add(UserProject(project_id=project_id, user_id=user_id, is_admin=True))
+        db.commit()
+
+
+@pytest.fixture
+def engines(monkeypatch: pytest.MonkeyPatch) -> Generator[tuple[Engine, Engine]]:
+    primary, replica = _sqlite_engine(), _sqlite_engine()
+    database = Database.from_engine(primary)
+    database.replica = Database.from_engine(replica)
+    monkeypatch.setattr("src.database._database", database)
+    router = ReadRouter(100, 60)
+    monkeypatch.setattr("src.database.read_router", router)
+    monkeypatch.setattr("src.service.read_router", router)
+    monkeypatch.setattr("src.service.membership_cache", InProcessMembershipCache(100, 60))
+    monkeypatch.setattr("src.service.project_details_cache", InProcessProjectDetailsCache(100, 60))
+    monkeypatch.setattr(get_settings(), "oauth_secret_key", "test_secret_key")
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def test_reads_use_replica_until_user_writes(engines: tuple[Engine, Engine]) -> None:
+    primary, replica = engines
+    user_id, replicated, lagging = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    for engine in engines:
+        with Session(engine) as db:
+            db.add(Users(id=user_id, name="owner", email="owner@example.com", hashed_password="-"))
+            db.commit()
+        _add_project(engine, user_id, replicated)
+    _add_project(primary, user_id, lagging)
+    headers = {"Authorization": f"Bearer {create_access_token('owner', user_id, timedelta(minutes=5))}"}
+    client = TestClient(app)
+    reads = request_metrics.db_reads.copy()
+
+    assert len(client.get("/projects", headers=headers).json()) == 1
+    assert client.get(f"/project/{lagging}/info", headers=headers).status_code == 404
+
+    body = {"name": "renamed", "description": "updated"}
+    assert client.put(f"/project/{replicated}/info", json=body, headers=headers).status_code == 200
+    assert len(client.get("/projects", headers=headers).json()) == 2
+    assert client.get(f"/project/{lagging}/info", headers=headers).status_code == 200
+
+    assert request_metrics.db_reads[ReadTarget.REPLICA] - reads[ReadTarget.REPLICA] == 2
+    assert request_metrics.db_reads[ReadTarget.STICKY_PRIMARY] - reads[ReadTarget.STICKY_PRIMARY] == 2
+    assert 'db_read_routing_total{target="sticky_primary"}' in client.get("/metrics").text
+
+
+def test_replica_reads_do_not_fill_shared_caches(engines: tuple[Engine, Engine], query_budget: QueryBudget) -> None:
+    user_id, project_id = uuid.uuid4(), uuid.uuid4()
+    for engine in engines:
+        with Session(engine) as db:
+            db.add(Users(id=user_id, name="owner", email="owner@example.com", hashed_password="-"))
+            db.commit()
+        _add_project(engine, user_id, project_id)
+    headers = {"Authorization": f"Bearer {create_access_token('owner', user_id, timedelta(minutes=5))}"}
+    client = TestClient(app)
+    info_url = f"/project/{project_id}/info"
+
+    for _ in range(2):
+        response = client.get(info_url, headers=headers)
+        assert int(response.headers["X-DB-Queries"]) == 1
+
+    client.put(info_url, json={"name": "renamed", "description": "updated"}, headers=headers)
+    query_budget(client.get(info_url, headers=headers), 1)
+    query_budget(client.get(info_url, headers=headers), 0)
+
+
+def test_database_from_settings_builds_replica() -> None:
+    settings = dataclasses.replace(get_settings(), postgres_server="primary", postgres_replica_server="replica")
+    database = Database.from_settings(settings)
+
+    assert database.engine.url.host == "primary"
+    assert database.replica is not None
+    assert database.replica.engine.url.host == "replica"
+    assert database.replica.replica is None
+
+
+def test_read_your_writes_cookie_sticks_across_workers(
+    engines: tuple[Engine, Engine], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    primary, _ = engines
+    user_id, replicated, lagging = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    for engine in engines:
+        with Session(engine) as db:
+            db.add(Users(id=user_id, name="owner", email="owner@example.com", hashed_password="-"))
+            db.commit()
+        _add_project(engine, user_id, replicated)
+    _add_project(primary, user_id, lagging)
+    headers = {"Authorization": f"Bearer {create_access_token('owner', user_id, timedelta(minutes=5))}"}
+    client = TestClient(app)
+
+    response = client.put(f"/project/{replicated}/info", json={"name": "renamed"}, headers=headers)
+    assert READ_YOUR_WRITES_COOKIE in response.cookies
+    other_worker = ReadRouter(100, 60)
+    monkeypatch.setattr("src.database.read_router", other_worker)
+    monkeypatch.setattr("src.service.read_router", other_worker)
+
+    assert client.get(f"/project/{lagging}/info", headers=headers).status_code == 200
+    client.cookies.clear()
+    reads = request_metrics.db_reads.copy()
+    assert len(client.get("/projects", headers=headers).json()) == 1
+    assert request_metrics.db_reads[ReadTarget.REPLICA] - reads[ReadTarget.REPLICA] == 1
+
+
+def test_read_your_writes_cookie_is_signed_and_expires(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "oauth_secret_key", "test_secret_key")
+    now = 1000.0
+    writer = ReadRouter(100, 5, timer=lambda: now)
+    reader = ReadRouter(100, 5, timer=lambda: now)
+    user_id = uuid.uuid4()
+    cookie = writer.record_write(user_id)
+    assert cookie is not None
+    owner, until, signature = cookie.split(".")
+
+    assert reader.wrote_recently(user_id, cookie)
+    assert not reader.wrote_recently(uuid.uuid4(), cookie)
+    assert not reader.wrote_recently(user_id, f"{owner}.{int(until) + 60}.{signature}")
+    assert not reader.wrote_recently(user_id, "garbage")
+    now += 5
+    assert not reader.wrote_recently(user_id, cookie)
+    assert ReadRouter(100, 0).record_write(user_id) is None
@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import AsyncIterator
+
+import pytest
+
+from src.responses import RangeNotSatisfiable, parse_range
+from src.storage import BlobStore, LocalStorage, UploadTooLarge
+
+
+async def _chunks(*chunks: bytes) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+async def _read(storage: LocalStorage, key: str, start: int, length: int) -> bytes:
+    return b"".join([chunk async for chunk in storage.read(key, start, length)])
+
+
+def test_local_storage_round_trip(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path)
+    size = asyncio.run(storage.write("project/document", _chunks(b"hello ", b"world")))
+
+    assert size == 11
+    assert asyncio.run(_read(storage, "project/document", 6, 5)) == b"world"
+    assert asyncio.run(storage.stat("project/document")).size == 11
+    asyncio.run(storage.delete("project/document"))
+    assert not (tmp_path / "project" / "document").exists()
+
+
+def test_local_storage_rejects_oversized_upload(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(storage.write("project/document", _chunks(b"12345", b"67890"), max_size=8))
+
+    assert list((tmp_path / "project").iterdir()) == []
+
+
+def test_local_storage_rejects_path_traversal(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        LocalStorage(tmp_path).local_path("../outside")
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-4", (0, 4)),
+        ("bytes=5-", (5, 9)),
+        ("bytes=-3", (7, 9)),
+        ("bytes=8-100", (8, 9)),
+        ("bytes=0-1,4-5", None),
+        ("items=0-1", None),
+        ("bytes=a-b", None),
+    ],
+)
+def test_parse_range(header: str, expected: tuple[int, int] | None) -> None:
+    assert parse_range(header, 10) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=10-", "bytes=5-2", "bytes=-0"])
+def test_parse_range_not_satisfiable(header: str) -> None:
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 10)
+
+
+def test_blob_store_deduplicates_content(tmp_path: Path) -> None:
+    blob_store = BlobStore(LocalStorage(tmp_path))
+    first = asyncio.run(blob_store.stage(_chunks(b"same ", b"content")))
+    second = asyncio.run(blob_store.stage(_chunks(b"same content")))
+
+    assert (
+        (first.digest, first.size) == (second.digest, second.size) == (hashlib.sha256(b"same content").hexdigest(), 12)
+    )
+    asyncio.run(blob_store.publish(first))
+    asyncio.run(blob_store.publish(second))
+    asyncio.run(blob_store.discard(second))
+    assert [path.name for path in (tmp_path / "blobs").rglob("*") if path.is_file()] == [first.digest]
+    assert list((tmp_path / "uploads").iterdir()) == []
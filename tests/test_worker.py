@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from src.worker import JobQueue
+
+
+def test_job_queue_runs_jobs_and_drains_on_stop() -> None:
+    queue = JobQueue("test")
+    done: list[int] = []
+
+    async def job(value: int) -> None:
+        await asyncio.sleep(0)
+        done.append(value)
+
+    async def failing() -> None:
+        raise RuntimeError("boom")
+
+    async def run() -> None:
+        queue.start(2)
+        for value in range(5):
+            queue.submit(job, value)
+        queue.submit(failing)
+        await queue.stop(timeout=1)
+
+    asyncio.run(run())
+
+    assert sorted(done) == [0, 1, 2, 3, 4]
+    assert queue.stats() == {"workers": 0, "pending": 0, "submitted": 6, "completed": 5, "failed": 1}
+
+
+def test_job_queue_rejects_jobs_when_stopped() -> None:
+    async def job() -> None: ...
+
+    with pytest.raises(RuntimeError):
+        JobQueue("test").submit(job)